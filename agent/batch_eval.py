@@ -0,0 +1,156 @@
+from time import process_time
+from typing import Callable
+
+import numpy as np
+
+from .batch_rollout import CELLS, BatchBoards, rollout_batch
+from .telemetry import debug
+from .helpers.fast_board import FastBoard
+from referee.game.constants import BOARD_N
+
+# Batched leaf evaluation: searches queue positions with a callback instead
+# of evaluating each leaf on its own, and the queue is evaluated in one NumPy
+# pass once it holds batch_size positions or its oldest entry has waited
+# max_wait CPU seconds. A search flushes the queue before it returns, so a
+# batch only holds leaves of one search.
+#
+# Positions become feature tensors from the view of the player to move:
+# planes for own/opponent tokens and own/opponent frontiers (4 x 121), the
+# fill count of every row and column (22), then the number of legal moves of
+# each side (2). A model maps the (N, 508) tensor to the probability that
+# the player to move wins.
+
+NUM_PLANES = 4
+FILLS = NUM_PLANES * CELLS  # offset of the line fills
+MOBILITY = FILLS + 2 * BOARD_N  # offset of the legal move counts
+NUM_FEATURES = MOBILITY + 2
+BATCH_SIZE = 16
+MAX_WAIT = 0.05
+VALUE_SCALE = 8.0  # frontier lead worth ~73% in the heuristic model
+LINE_WEIGHT = 0.5  # weight of near-full lines in the heuristic model
+NEAR_FULL = BOARD_N - 2
+
+
+def feature_tensor(boards: list[FastBoard]) -> np.ndarray:
+    """
+    Features of the positions, (N, NUM_FEATURES) float32
+    """
+    batch = BatchBoards(boards)
+    games = np.arange(len(boards))
+    movers = batch.turn_color
+    own = batch.planes[games, movers]
+    opp = batch.planes[games, 1 - movers]
+    empty = ~(own | opp)
+    planes = np.stack(
+        [own, opp, batch.frontier(own, empty), batch.frontier(opp, empty)], axis=1
+    )[:, :, :CELLS]
+    grid = (own | opp)[:, :CELLS].reshape(-1, BOARD_N, BOARD_N)
+    fills = np.concatenate([grid.sum(axis=2), grid.sum(axis=1)], axis=1)
+    mobility = np.stack(
+        [
+            batch.legal(games, movers)[0].sum(axis=1),
+            batch.legal(games, 1 - movers, False)[0].sum(axis=1),
+        ],
+        axis=1,
+    )
+    return np.concatenate(
+        [planes.reshape(len(boards), -1), fills, mobility], axis=1, dtype=np.float32
+    )
+
+
+def heuristic_model(features: np.ndarray) -> np.ndarray:
+    """
+    Hand-weighted value: frontier lead plus near-full lines for the mover
+    """
+    own_frontier = features[:, 2 * CELLS : 3 * CELLS].sum(axis=1)
+    opp_frontier = features[:, 3 * CELLS : 4 * CELLS].sum(axis=1)
+    near_lines = (features[:, FILLS:MOBILITY] >= NEAR_FULL).sum(axis=1)
+    score = own_frontier - opp_frontier + LINE_WEIGHT * near_lines
+    return 1 / (1 + np.exp(-score / VALUE_SCALE))
+
+
+class RolloutModel:
+    """
+    Leaf values from vectorised playouts (batch_rollout.rollout_batch)
+    instead of a static model: 1 / 0.5 / 0 by the mover's predicted result.
+    Takes the boards rather than their feature tensor.
+    """
+
+    on_boards = True
+
+    def __init__(self, max_steps: int, heavy: bool = False):
+        self.max_steps = max_steps
+        self.heavy = heavy
+
+    def __call__(self, boards: list[FastBoard]) -> np.ndarray:
+        winners = rollout_batch(boards, self.max_steps, self.heavy)
+        return np.array(
+            [
+                0.5 if winner is None else float(winner == board.turn_color)
+                for board, winner in zip(boards, winners)
+            ],
+            dtype=np.float32,
+        )
+
+
+class BatchEvaluator:
+    """
+    Queue of positions waiting to be evaluated together
+    """
+
+    def __init__(
+        self,
+        batch_size: int = BATCH_SIZE,
+        max_wait: float = MAX_WAIT,
+        model: Callable = heuristic_model,
+    ):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.model = model
+        self.queue: list[tuple[FastBoard, Callable[[float], None]]] = []
+        self.first_queued: float = 0
+
+        # statistics
+        self.batches = 0
+        self.positions = 0
+        self.eval_time: float = 0
+
+    def submit(self, board: FastBoard, callback: Callable[[float], None]):
+        """
+        Queue a position, callback gets the mover's win probability later
+        """
+        if not self.queue:
+            self.first_queued = process_time()
+        self.queue.append((board, callback))
+        if (
+            len(self.queue) >= self.batch_size
+            or process_time() - self.first_queued >= self.max_wait
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Evaluate everything queued and hand out the values
+        """
+        if not self.queue:
+            return
+        queue, self.queue = self.queue, []
+        start = process_time()
+        boards = [board for board, _ in queue]
+        if getattr(self.model, "on_boards", False):
+            values = self.model(boards)
+        else:
+            values = self.model(feature_tensor(boards))
+        self.eval_time += process_time() - start
+        self.batches += 1
+        self.positions += len(queue)
+        for (_, callback), value in zip(queue, values):
+            callback(float(value))
+
+    def report(self):
+        if not self.batches:
+            return
+        debug(
+            f"batched eval: {self.positions} positions in {self.batches} batches, "
+            f"{self.eval_time / self.positions * 1e6:.0f}us per position"
+        )
@@ -0,0 +1,209 @@
+import random
+
+import numpy as np
+
+from .evaluation import CLOSE_TO_END
+from .helpers.fast_board import FastBoard
+from .helpers.placements import PLACEMENT_MASKS, PLACEMENT_NEIGHBOURS
+from referee.game.constants import BOARD_N, MAX_TURNS
+from referee.game.player import PlayerColor
+
+# Vectorised playouts: N positions are stepped together with NumPy, without
+# a Python loop per board. Boards are boolean planes of shape (N, 2, CELLS+1)
+# indexed by colour; the extra cell is always empty-but-unplayable padding so
+# ragged per-placement cell lists can be gathered as one array.
+# Legal moves of every game are one (N, placements) mask: all four cells
+# empty and (after the first two turns) one of them touching own tokens.
+# MCTS uses it through batch_eval.RolloutModel (BATCH_ROLLOUTS in program.py).
+# NumPy stays optional for the agent: this module, like batch_eval and
+# value_net, is only imported when batched evaluation is switched on.
+
+CELLS = BOARD_N * BOARD_N
+PAD = CELLS  # padding cell, never occupied and never part of a frontier
+NO_WINNER = -1
+UNRESOLVED = -2
+CHUNK_SIZE = 256  # games stepped together, larger batches fall out of cache
+
+# weights of the heavy policy: base, frontier gained, opponent frontier blocked
+HEAVY_WEIGHTS = (1.0, 1.0, 1.0)
+
+
+def _bits(mask: int) -> list[int]:
+    return [i for i in range(CELLS) if mask >> i & 1]
+
+
+# id -> the four cells covered, (placements, 4)
+PLACEMENT_CELLS = np.array([_bits(mask) for mask in PLACEMENT_MASKS], dtype=np.intp)
+# id -> the cells touching the placement, padded with PAD, (placements, k)
+_border = [_bits(mask) for mask in PLACEMENT_NEIGHBOURS]
+_width = max(len(cells) for cells in _border)
+PLACEMENT_BORDER = np.array(
+    [cells + [PAD] * (_width - len(cells)) for cells in _border], dtype=np.intp
+)
+
+
+class BatchBoards:
+    """
+    Many positions stored as boolean planes, stepped all at once
+    """
+
+    def __init__(self, boards: list[FastBoard], seed: int | None = None):
+        n = len(boards)
+        self.planes = np.zeros((n, 2, CELLS + 1), dtype=bool)
+        for i, board in enumerate(boards):
+            for color in range(2):
+                self.planes[i, color, _bits(board.tokens[color])] = True
+        self.turn_color = np.array([b.turn_color.value for b in boards], np.intp)
+        self.turn_count = np.array([b.turn_count for b in boards], np.intp)
+        self.rng = np.random.default_rng(seed)
+
+    def frontier(self, tokens: np.ndarray, empty: np.ndarray) -> np.ndarray:
+        """
+        Empty cells touching the given token planes (M, CELLS+1), on the torus
+        """
+        grid = tokens[:, :CELLS].reshape(-1, BOARD_N, BOARD_N)
+        touching = (
+            np.roll(grid, 1, axis=1)
+            | np.roll(grid, -1, axis=1)
+            | np.roll(grid, 1, axis=2)
+            | np.roll(grid, -1, axis=2)
+        )
+        result = np.zeros_like(tokens)
+        result[:, :CELLS] = touching.reshape(-1, CELLS)
+        return result & empty
+
+    def legal(
+        self, games: np.ndarray, colors: np.ndarray, first_turns: bool = True
+    ) -> tuple:
+        """
+        Legal placement masks (M, placements) of the given colours, with the
+        planes needed to weigh them
+        Without first_turns, placements must touch own tokens on any turn
+        (like count_legal)
+        """
+        own = self.planes[games, colors]
+        opp = self.planes[games, 1 - colors]
+        empty = ~(own | opp)
+        empty[:, PAD] = False
+        own_frontier = self.frontier(own, empty)
+        free = empty[:, PLACEMENT_CELLS].all(axis=2)
+        touching = own_frontier[:, PLACEMENT_CELLS].any(axis=2)
+        first = (self.turn_count[games] < 2)[:, None] & first_turns
+        return free & (touching | first), own, opp, empty, own_frontier
+
+    def choose(self, legal, own, opp, empty, own_frontier, heavy: bool):
+        """
+        Pick one legal placement per game, uniformly or weighted by features
+        """
+        keys = self.rng.random(legal.shape, dtype=np.float32)
+        if heavy:
+            base, w_gained, w_blocked = HEAVY_WEIGHTS
+            gained = (empty & ~own_frontier)[:, PLACEMENT_BORDER].sum(
+                axis=2, dtype=np.float32
+            )
+            opp_frontier = self.frontier(opp, empty)
+            blocked = opp_frontier[:, PLACEMENT_CELLS].sum(axis=2, dtype=np.float32)
+            weights = base + w_gained * gained + w_blocked * blocked
+            # the largest u ** (1 / w) is drawn with probability proportional to w
+            keys **= 1 / weights
+        keys[~legal] = -1
+        return keys.argmax(axis=1)
+
+    def apply(self, games: np.ndarray, moves: np.ndarray):
+        """
+        Place one piece in each of the given games and clear full lines
+        """
+        colors = self.turn_color[games]
+        self.planes[games[:, None], colors[:, None], PLACEMENT_CELLS[moves]] = True
+        occupied = self.planes[games, 0, :CELLS] | self.planes[games, 1, :CELLS]
+        grid = occupied.reshape(-1, BOARD_N, BOARD_N)
+        rows = grid.all(axis=2)
+        cols = grid.all(axis=1)
+        if rows.any() or cols.any():
+            cleared = (rows[:, :, None] | cols[:, None, :]).reshape(-1, 1, CELLS)
+            self.planes[games, :, :CELLS] &= ~cleared
+        self.turn_color[games] ^= 1
+        self.turn_count[games] += 1
+
+    def resolve(self, games: np.ndarray) -> np.ndarray:
+        """
+        Winner (colour index or NO_WINNER) of games the playout stopped in:
+        the game rules if over, else the mobility heuristic like judge
+        """
+        movers = self.turn_color[games]
+        mover_moves = self.legal(games, movers, False)[0].sum(axis=1)
+        opp_moves = self.legal(games, 1 - movers, False)[0].sum(axis=1)
+        tokens = self.planes[games].sum(axis=2)
+        mover_tokens = tokens[np.arange(len(games)), movers]
+        opp_tokens = tokens[np.arange(len(games)), 1 - movers]
+        turns = self.turn_count[games]
+
+        score = (mover_moves - opp_moves).astype(float)
+        late = turns > CLOSE_TO_END
+        score[late] += (mover_tokens - opp_tokens)[late] / (
+            MAX_TURNS - turns[late] + 1
+        )
+        # turn limit: tokens alone decide, even if a player is stuck
+        at_limit = turns >= MAX_TURNS
+        score[at_limit] = np.sign(mover_tokens - opp_tokens)[at_limit]
+        # stuck player to move before the limit
+        score[(mover_moves == 0) & (turns > 1) & ~at_limit] = -1
+
+        winners = np.full(len(games), NO_WINNER)
+        winners[score > 0] = movers[score > 0]
+        winners[score < 0] = 1 - movers[score < 0]
+        return winners
+
+
+def rollout_batch(
+    positions: list[FastBoard],
+    max_steps: int,
+    heavy: bool = False,
+    seed: int | None = None,
+) -> list[PlayerColor | None]:
+    """
+    Play one playout from every position at once, each stopping at the end
+    of its game or after max_steps moves
+    Return the (predicted) winner of each playout
+    """
+    if len(positions) > CHUNK_SIZE:
+        rng = random.Random(seed)
+        return [
+            winner
+            for i in range(0, len(positions), CHUNK_SIZE)
+            for winner in rollout_batch(
+                positions[i : i + CHUNK_SIZE], max_steps, heavy, rng.getrandbits(32)
+            )
+        ]
+    if not positions:
+        return []
+    batch = BatchBoards(positions, seed)
+    winners = np.full(len(positions), UNRESOLVED)
+    active = np.arange(len(positions))
+    for _ in range(max_steps):
+        active = active[batch.turn_count[active] < MAX_TURNS]
+        if not active.size:
+            break
+        legal, own, opp, empty, own_frontier = batch.legal(
+            active, batch.turn_color[active]
+        )
+        stuck = ~legal.any(axis=1) & (batch.turn_count[active] > 1)
+        winners[active[stuck]] = 1 - batch.turn_color[active[stuck]]
+        playing = ~stuck
+        active = active[playing]
+        if not active.size:
+            break
+        moves = batch.choose(
+            legal[playing],
+            own[playing],
+            opp[playing],
+            empty[playing],
+            own_frontier[playing],
+            heavy,
+        )
+        batch.apply(active, moves)
+
+    open_games = np.flatnonzero(winners == UNRESOLVED)
+    if open_games.size:
+        winners[open_games] = batch.resolve(open_games)
+    return [None if w == NO_WINNER else PlayerColor(int(w)) for w in winners]
@@ -0,0 +1,93 @@
+import mmap
+import os
+import struct
+
+from .helpers.fast_board import FastBoard
+from .helpers.symmetry import INVERSES, canonical, position_hash, transform_move
+
+# Opening book: best replies to early positions, searched offline by
+# testing/build_book.py. The file is a sorted array of fixed size records
+# (canonical position hash, reply in the canonical frame), read through a
+# read-only mmap: opening it costs nothing, pages are loaded on demand and
+# shared with every other process mapping the same file.
+
+BOOK_PATH = os.path.join(os.path.dirname(__file__), "opening_book.bin")
+RECORD = struct.Struct("<QH")  # position hash, placement id
+
+
+def book_key(board: FastBoard) -> tuple[int, int]:
+    """
+    Get the hash of a position and the transform to its canonical frame
+    """
+    color = board.turn_color
+    own, opp, transform = canonical(
+        board.tokens[color], board.tokens[color.opponent]
+    )
+    return position_hash(own, opp, board.turn_count), transform
+
+
+def write_book(entries: dict[int, int], path: str = BOOK_PATH):
+    """
+    Write position hash -> canonical reply entries as a sorted book file
+    """
+    with open(path, "wb") as f:
+        for key in sorted(entries):
+            f.write(RECORD.pack(key, entries[key]))
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file, empty if the file does not exist
+    """
+
+    def __init__(self, path: str = BOOK_PATH):
+        self.data: mmap.mmap | None = None
+        self.size = 0
+        self.hits = 0
+        if os.path.exists(path) and os.path.getsize(path) >= RECORD.size:
+            with open(path, "rb") as f:
+                # the mapping stays valid after the file is closed
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = len(self.data) // RECORD.size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def find(self, key: int) -> int | None:
+        """
+        Binary search the records for a position hash
+        """
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found, move_id = RECORD.unpack_from(self.data, mid * RECORD.size)  # type: ignore
+            if found == key:
+                return move_id
+            if found < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def lookup(self, board: FastBoard) -> int | None:
+        """
+        Get the book reply to a position, mapped back to its own frame
+        """
+        if not self.size:
+            return None
+        key, transform = book_key(board)
+        move_id = self.find(key)
+        if move_id is None:
+            return None
+        move_id = transform_move(move_id, INVERSES[transform])
+        if move_id not in board.legal_moves():
+            # hash collision
+            return None
+        self.hits += 1
+        return move_id
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+            self.size = 0
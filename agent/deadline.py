@@ -0,0 +1,74 @@
+import signal
+import threading
+from time import process_time
+
+# Hard per-move deadline for anytime search. When possible a CPU-time interval
+# timer (ITIMER_PROF, the same clock the referee charges) raises a flag from
+# its signal handler, so checking the deadline inside rollouts is just an
+# attribute read. Elsewhere (other threads, no setitimer) the clock is polled.
+# The signal handler never interrupts the search itself: the search checks the
+# flag at safe points and unwinds with SearchTimeout.
+
+
+class SearchTimeout(Exception):
+    """
+    Raised at a safe point once the deadline has passed
+    """
+
+
+class Deadline:
+    """
+    CPU time deadline, armed for the duration of a search
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.end = process_time() + budget
+        self.hit = budget <= 0
+        self.interrupts = 0  # iterations aborted by this deadline
+        self._armed = False
+        self._old_handler = None
+
+    def __enter__(self) -> "Deadline":
+        self.arm()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disarm()
+
+    def arm(self):
+        """
+        Start the interval timer if we are allowed to use signals here
+        """
+        if (
+            self.hit
+            or not hasattr(signal, "setitimer")
+            or threading.current_thread() is not threading.main_thread()
+        ):
+            return
+        self._old_handler = signal.signal(signal.SIGPROF, self._on_signal)
+        signal.setitimer(signal.ITIMER_PROF, self.budget)
+        self._armed = True
+
+    def disarm(self):
+        if not self._armed:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._old_handler or signal.SIG_DFL)
+        self._armed = False
+
+    def _on_signal(self, signum, frame):
+        self.hit = True
+
+    def expired(self) -> bool:
+        if not self.hit and not self._armed:
+            self.hit = process_time() >= self.end
+        return self.hit
+
+    def check(self):
+        """
+        Raise SearchTimeout if the deadline has passed
+        """
+        if self.hit or (not self._armed and self.expired()):
+            self.interrupts += 1
+            raise SearchTimeout
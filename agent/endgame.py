@@ -0,0 +1,213 @@
+from .deadline import Deadline, SearchTimeout
+from .telemetry import debug
+from .helpers.fast_board import FastBoard
+from .helpers.placements import FULL_MASK, PLACEMENT_MASKS, frontier
+from .helpers.transposition import (
+    EXACT,
+    LOWER,
+    UPPER,
+    TranspositionTable,
+    zobrist_key,
+    zobrist_update,
+)
+from referee.game.constants import MAX_TURNS
+from referee.game.player import PlayerColor
+
+# Exact endgame solver: once both sides are short of placements the game is
+# usually decided by who runs out first, which MCTS only notices one ply at a
+# time. Iterative deepening negamax over win (1) / draw or unknown (0) /
+# loss (-1): positions cut off by the depth limit count as 0, so a root
+# value of 1 or -1 is a proof whatever the depth. Moves are ordered by the
+# table move, then by how much of the opponent's frontier they take.
+
+ENDGAME_MOBILITY = 60  # combined legal moves at which the solver is tried
+SOLVER_SHARE = 0.3  # share of the move's time the solver may use
+MAX_SOLVE_TIME = 10.0  # CPU seconds, whatever the move's time
+MAX_SOLVE_DEPTH = 60
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+def mobility(board: FastBoard) -> int:
+    """
+    Number of legal moves of both sides
+    """
+    color = board.turn_color
+    return len(board.legal_moves(color)) + len(board.legal_moves(color.opponent))
+
+
+class EndgameSolver:
+    """
+    Alpha-beta prover, keeping its transposition table across moves
+    """
+
+    def __init__(self):
+        self.table = TranspositionTable()
+        self.nodes = 0
+        self.depth = 0  # last completed depth
+        self.refuted: set[int] = set()  # root moves proven to lose
+        self.solved = 0
+        self.give_ups = 0
+        self._cut = False  # a leaf was cut off by the depth limit
+
+    def solve(self, board: FastBoard, budget: float) -> tuple[int | None, int | None]:
+        """
+        Prove the result of the position for the player to move
+        Return (WIN/DRAW/LOSS, best move), or (None, None) if the time slice
+        ran out first; refuted holds the root moves proven lost so far
+        """
+        board = board.copy()
+        key = zobrist_key(
+            board.tokens[0],
+            board.tokens[1],
+            board.turn_color == PlayerColor.BLUE,
+            board.turn_count,
+        )
+        self.nodes = 0
+        self.depth = 0
+        self.refuted = set()
+        try:
+            with Deadline(budget) as deadline:
+                for depth in range(1, MAX_SOLVE_DEPTH + 1):
+                    self._cut = False
+                    value, move = self.root_search(board, key, depth, deadline)
+                    self.depth = depth
+                    if value != DRAW or not self._cut:
+                        self.solved += 1
+                        return value, move
+        except SearchTimeout:
+            pass
+        self.give_ups += 1
+        return None, None
+
+    def root_search(
+        self, board: FastBoard, key: int, depth: int, deadline: Deadline
+    ) -> tuple[int, int | None]:
+        """
+        Search every root move, remembering the ones proven lost
+        """
+        alpha = LOSS
+        best_move = None
+        for move in self.ordered_moves(board, key):
+            child = self.child_key(board, key, move)
+            value = -self.negamax(board, child, depth - 1, LOSS, -alpha, deadline)
+            board.undo()
+            if value == LOSS:
+                self.refuted.add(move)
+            if best_move is None or value > alpha:
+                alpha = value
+                best_move = move
+            if alpha == WIN:
+                break
+        if best_move is None:
+            return LOSS, None
+        self.table.store(key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def negamax(
+        self,
+        board: FastBoard,
+        key: int,
+        depth: int,
+        alpha: int,
+        beta: int,
+        deadline: Deadline,
+    ) -> int:
+        """
+        Value of the position for the player to move within [alpha, beta]
+        """
+        self.nodes += 1
+        deadline.check()
+        if board.turn_count >= MAX_TURNS:
+            return self.turn_limit_value(board)
+
+        entry = self.table.probe(key)
+        table_move = -1
+        if entry is not None:
+            _, stored_depth, value, bound, table_move = entry
+            # wins and losses hold at any depth
+            if value == WIN and bound != UPPER or value == LOSS and bound != LOWER:
+                return int(value)
+            if stored_depth >= depth and (
+                bound == EXACT
+                or bound == LOWER and value >= beta
+                or bound == UPPER and value <= alpha
+            ):
+                if value == DRAW:
+                    self._cut = True
+                return int(value)
+        if depth == 0:
+            if not board.has_move(board.turn_color):
+                return LOSS
+            self._cut = True
+            return DRAW
+
+        original_alpha = alpha
+        best = LOSS  # also the value if there is no move
+        best_move = -1
+        for move in self.ordered_moves(board, key, table_move):
+            child = self.child_key(board, key, move)
+            value = -self.negamax(board, child, depth - 1, -beta, -alpha, deadline)
+            board.undo()
+            if value > best:
+                best = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        bound = EXACT
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        self.table.store(key, depth, best, bound, best_move)
+        return best
+
+    def child_key(self, board: FastBoard, key: int, move: int) -> int:
+        """
+        Apply a move and get the key of the new position
+        """
+        before = (board.tokens[0], board.tokens[1])
+        board.apply(move)
+        return zobrist_update(key, before, board.tokens, board.turn_count - 1)
+
+    def ordered_moves(self, board: FastBoard, key: int, table_move: int = -1):
+        """
+        Table move first, then moves taking the most opponent frontier
+        """
+        if table_move < 0:
+            entry = self.table.probe(key)
+            if entry is not None:
+                table_move = entry[4]
+        color = board.turn_color
+        opp_frontier = frontier(
+            board.tokens[color.opponent], FULL_MASK & ~board.occupied
+        )
+        moves = board.legal_moves()
+        moves.sort(
+            key=lambda m: (
+                m == table_move,
+                (PLACEMENT_MASKS[m] & opp_frontier).bit_count(),
+            ),
+            reverse=True,
+        )
+        return moves
+
+    def turn_limit_value(self, board: FastBoard) -> int:
+        """
+        Result at the turn limit for the player to move: the token count
+        decides, whoever can still move (as in the referee's winner_color)
+        """
+        color = board.turn_color
+        lead = board.token_count(color) - board.token_count(color.opponent)
+        return WIN if lead > 0 else LOSS if lead < 0 else DRAW
+
+    def report(self):
+        debug(
+            f"endgame: depth {self.depth}, {self.nodes} nodes, "
+            f"{self.solved} solved, {self.give_ups} given up, "
+            f"table hits {self.table.hit_rate():.0%}"
+        )
@@ -0,0 +1,122 @@
+from typing import Callable
+
+from .helpers.fast_board import FastBoard
+from .helpers.feature_board import FeatureBoard
+from .helpers.placements import FULL_MASK, count_legal, frontier
+from referee.game.constants import BOARD_N, MAX_TURNS
+from referee.game.player import PlayerColor
+
+# Static evaluation of the positions playouts stop in, on the bitboard, and
+# the cheap checks deciding where a playout stops: early once one side is
+# clearly ahead, later while lines are being cleared (like a quiescence
+# search, a position right after a clear often swings back).
+
+CLOSE_TO_END = 100  # past this turn, token counts break mobility ties
+MIN_CUTOFF_STEPS = 2  # playout steps before a decisive position can end it
+DECISIVE_RATIO = 2.0  # frontier ratio that counts as a decisive lead
+DECISIVE_TOKENS = 2 * BOARD_N  # token lead that decides the game near the end
+MAX_EXTENSION = 4  # extra playout steps while the position is volatile
+
+# weights of the incremental features, all from the view of the player to move
+FEATURE_WEIGHTS: dict[str, float] = {
+    "room": 1.0,  # frontier cells a piece still fits into, own - opponent
+    "tokens": 0.0,  # tokens on the board, own - opponent
+    "near_lines": 0.5,  # lines about to be cleared, the mover gets first go
+    "dead": -0.5,  # dead cells on the own frontier - opponent frontier
+}
+
+
+def judge(board: FastBoard) -> float:
+    """
+    Mobility difference for the player to move, with the token count as
+    tie breaker close to the end
+    """
+    color = board.turn_color
+    own = board.tokens[color]
+    opp = board.tokens[color.opponent]
+    result = count_legal(own, opp) - count_legal(opp, own)
+    if board.turn_count > CLOSE_TO_END:
+        result += (own.bit_count() - opp.bit_count()) / (
+            MAX_TURNS - board.turn_count + 1
+        )
+    return result
+
+
+def features(board: FeatureBoard) -> dict[str, float]:
+    """
+    Evaluation features of a position for the player to move
+    """
+    color = board.turn_color
+    opponent = color.opponent
+    dead = board.dead
+    return {
+        "room": board.room(color) - board.room(opponent),
+        "tokens": board.tokens[color].bit_count()
+        - board.tokens[opponent].bit_count(),
+        "near_lines": board.near_full_lines(),
+        "dead": (dead & board.frontiers[color]).bit_count()
+        - (dead & board.frontiers[opponent]).bit_count(),
+    }
+
+
+def feature_judge(board: FeatureBoard) -> float:
+    """
+    Weighted sum of the incremental features, for the player to move,
+    with the token count as tie breaker close to the end like judge
+    """
+    result = sum(
+        FEATURE_WEIGHTS[name] * value for name, value in features(board).items()
+    )
+    if board.turn_count > CLOSE_TO_END:
+        color = board.turn_color
+        result += (
+            board.tokens[color].bit_count() - board.tokens[color.opponent].bit_count()
+        ) / (MAX_TURNS - board.turn_count + 1)
+    return result
+
+
+def is_decisive(board: FastBoard) -> bool:
+    """
+    Check if one side is clearly ahead: far more room to grow (frontier
+    cells, a cheap stand-in for mobility) or, near the end, far more tokens
+    """
+    red, blue = board.tokens
+    empty = FULL_MASK & ~(red | blue)
+    red_room = frontier(red, empty).bit_count()
+    blue_room = frontier(blue, empty).bit_count()
+    if min(red_room, blue_room) * DECISIVE_RATIO <= max(red_room, blue_room):
+        return True
+    return (
+        board.turn_count > CLOSE_TO_END
+        and abs(red.bit_count() - blue.bit_count()) >= DECISIVE_TOKENS
+    )
+
+
+def is_volatile(board: FastBoard) -> bool:
+    """
+    Check if the position is still settling after a line clear
+    """
+    return board.last_move_cleared()
+
+
+# name -> (evaluation, board class it needs)
+EVALUATORS: dict[str, tuple[Callable, type[FastBoard]]] = {
+    "mobility": (judge, FastBoard),
+    "features": (feature_judge, FeatureBoard),
+}
+
+
+def predicted_winner(
+    board: FastBoard, evaluate: Callable[..., float] = judge
+) -> PlayerColor | None:
+    """
+    Winner of a finished game, else the side the heuristic favours
+    """
+    if board.game_over:
+        return board.winner_color
+    score = evaluate(board)
+    if score > 0:
+        return board.turn_color
+    elif score < 0:
+        return board.turn_color.opponent
+    return None
@@ -0,0 +1,168 @@
+import random
+
+from .placements import (
+    CELL_PLACEMENTS,
+    FULL_MASK,
+    NUM_PLACEMENTS,
+    PLACEMENT_LINES,
+    PLACEMENT_MASKS,
+    action_id,
+    frontier,
+    state_masks,
+)
+from .sim_board import SimBoard
+from referee.game.actions import Action
+from referee.game.constants import MAX_TURNS
+from referee.game.player import PlayerColor
+
+
+class FastBoard:
+    """
+    Bitboard version of SimBoard: one 121 bit mask per colour, moves are
+    global placement ids and every move can be undone
+    """
+
+    __slots__ = ("tokens", "turn_color", "turn_count", "_history")
+
+    def __init__(
+        self,
+        red: int = 0,
+        blue: int = 0,
+        turn_color: PlayerColor = PlayerColor.RED,
+        turn_count: int = 0,
+    ):
+        # indexed by PlayerColor (RED = 0, BLUE = 1)
+        self.tokens: list[int] = [red, blue]
+        self.turn_color: PlayerColor = turn_color
+        self.turn_count: int = turn_count
+        self._history: list[tuple[int, int]] = []
+
+    @classmethod
+    def from_sim_board(cls, board: SimBoard) -> "FastBoard":
+        red, blue = state_masks(board.state, PlayerColor.RED)
+        return cls(red, blue, board.turn_color, board.turn_count)
+
+    def copy(self) -> "FastBoard":
+        """
+        Copy the position (not the undo history)
+        """
+        return FastBoard(
+            self.tokens[0], self.tokens[1], self.turn_color, self.turn_count
+        )
+
+    def apply(self, move_id: int):
+        """
+        Place a piece for the player to move and clear any filled lines
+        """
+        red, blue = self.tokens
+        self._history.append((red, blue))
+        self.tokens[self.turn_color] |= PLACEMENT_MASKS[move_id]
+
+        occupied = self.tokens[0] | self.tokens[1]
+        cleared = 0
+        for line in PLACEMENT_LINES[move_id]:
+            if occupied & line == line:
+                cleared |= line
+        if cleared:
+            self.tokens[0] &= ~cleared
+            self.tokens[1] &= ~cleared
+
+        self.turn_color = self.turn_color.opponent
+        self.turn_count += 1
+
+    def apply_action(self, action: Action):
+        self.apply(action_id(action))
+
+    def undo(self):
+        """
+        Take back the last move
+        """
+        self.tokens[0], self.tokens[1] = self._history.pop()
+        self.turn_color = self.turn_color.opponent
+        self.turn_count -= 1
+
+    def last_move_cleared(self) -> bool:
+        """
+        Check if the last move cleared any line
+        """
+        if not self._history:
+            return False
+        red, blue = self._history[-1]
+        return self.occupied.bit_count() < (red | blue).bit_count() + 4
+
+    @property
+    def occupied(self) -> int:
+        return self.tokens[0] | self.tokens[1]
+
+    def legal_moves(self, color: PlayerColor | None = None) -> list[int]:
+        """
+        Get the ids of all legal moves for a colour (default: player to move)
+        """
+        if color is None:
+            color = self.turn_color
+        own = self.tokens[color]
+        occupied = self.occupied
+        if self.turn_count < 2:
+            # first turns: anywhere empty
+            return [
+                i for i in range(NUM_PLACEMENTS) if not PLACEMENT_MASKS[i] & occupied
+            ]
+        moves = set()
+        cells = frontier(own, FULL_MASK & ~occupied)
+        while cells:
+            low = cells & -cells
+            for move_id in CELL_PLACEMENTS[low.bit_length() - 1]:
+                if not PLACEMENT_MASKS[move_id] & occupied:
+                    moves.add(move_id)
+            cells ^= low
+        return list(moves)
+
+    def has_move(self, color: PlayerColor) -> bool:
+        """
+        Check if a colour can place any piece
+        """
+        own = self.tokens[color]
+        occupied = self.occupied
+        if self.turn_count < 2:
+            return True
+        cells = frontier(own, FULL_MASK & ~occupied)
+        while cells:
+            low = cells & -cells
+            for move_id in CELL_PLACEMENTS[low.bit_length() - 1]:
+                if not PLACEMENT_MASKS[move_id] & occupied:
+                    return True
+            cells ^= low
+        return False
+
+    def random_move(self) -> int:
+        return random.choice(self.legal_moves())
+
+    def token_count(self, color: PlayerColor) -> int:
+        return self.tokens[color].bit_count()
+
+    @property
+    def turn_limit_reached(self) -> bool:
+        return self.turn_count >= MAX_TURNS
+
+    @property
+    def game_over(self) -> bool:
+        """
+        Same rule as SimBoard: turn limit reached or the player to move is stuck
+        """
+        return self.turn_limit_reached or (
+            self.turn_count > 1 and not self.has_move(self.turn_color)
+        )
+
+    @property
+    def winner_color(self) -> PlayerColor | None:
+        if not self.game_over:
+            return None
+        if self.turn_limit_reached:
+            # tokens alone decide at the turn limit, even if someone is stuck
+            red = self.token_count(PlayerColor.RED)
+            blue = self.token_count(PlayerColor.BLUE)
+            if red == blue:
+                return None
+            return PlayerColor.RED if red > blue else PlayerColor.BLUE
+        # otherwise the game only ends when the player to move is stuck
+        return self.turn_color.opponent
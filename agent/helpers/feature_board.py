@@ -0,0 +1,147 @@
+from .fast_board import FastBoard
+from .placements import (
+    CELL_NEIGHBOURS,
+    COL_MASKS,
+    FULL_MASK,
+    PLACEMENT_MASKS,
+    PLACEMENT_NEIGHBOURS,
+    ROW_MASKS,
+    frontier,
+)
+from referee.game.constants import BOARD_N
+from referee.game.player import PlayerColor
+
+# FastBoard that keeps its evaluation features up to date move by move, so
+# that judging a position is a few integer operations instead of generating
+# legal moves. Everything is recomputed from scratch only after a line clear.
+#
+# Line fills are packed 5 bits per row/column into one int: a placement adds
+# a precomputed packed increment, and counting lines filled to at least
+# NEAR_FULL is one add, one mask and a popcount.
+
+LINE_BITS = 5
+LINES = ROW_MASKS + COL_MASKS
+NEAR_FULL = BOARD_N - 2  # lines this full are about to be cleared
+_FIELD_TOP = sum(1 << (i * LINE_BITS + LINE_BITS - 1) for i in range(len(LINES)))
+# adding this pushes fields >= NEAR_FULL up to their top bit
+_NEAR_OFFSET = sum(
+    (2 ** (LINE_BITS - 1) - NEAR_FULL) << (i * LINE_BITS) for i in range(len(LINES))
+)
+
+# id -> packed line fill increment of a placement
+PLACEMENT_FILLS: list[int] = [
+    sum(
+        (mask & line).bit_count() << (i * LINE_BITS)
+        for i, line in enumerate(LINES)
+        if mask & line
+    )
+    for mask in PLACEMENT_MASKS
+]
+
+
+def packed_fills(occupied: int) -> int:
+    """
+    Pack the number of occupied cells of every row and column
+    """
+    return sum(
+        (occupied & line).bit_count() << (i * LINE_BITS)
+        for i, line in enumerate(LINES)
+    )
+
+
+def dead_cells(empty: int, cells: int) -> int:
+    """
+    Get the given empty cells with no empty neighbour: no piece fits there
+    until a line clear opens them up
+    """
+    dead = 0
+    while cells:
+        low = cells & -cells
+        if not CELL_NEIGHBOURS[low.bit_length() - 1] & empty:
+            dead |= low
+        cells ^= low
+    return dead
+
+
+class FeatureBoard(FastBoard):
+    """
+    FastBoard maintaining frontiers, line fills and dead cells on apply/undo
+    """
+
+    __slots__ = ("frontiers", "fills", "dead", "_feature_history")
+
+    def __init__(
+        self,
+        red: int = 0,
+        blue: int = 0,
+        turn_color: PlayerColor = PlayerColor.RED,
+        turn_count: int = 0,
+    ):
+        super().__init__(red, blue, turn_color, turn_count)
+        self._feature_history: list[tuple[int, int, int, int]] = []
+        self.frontiers: list[int] = [0, 0]
+        self.fills = 0
+        self.dead = 0
+        self.refresh()
+
+    def refresh(self):
+        """
+        Recompute every feature from the tokens
+        """
+        occupied = self.occupied
+        empty = FULL_MASK & ~occupied
+        self.frontiers = [frontier(tokens, empty) for tokens in self.tokens]
+        self.fills = packed_fills(occupied)
+        self.dead = dead_cells(empty, empty)
+
+    def copy(self) -> "FeatureBoard":
+        board = FeatureBoard.__new__(FeatureBoard)
+        board.tokens = list(self.tokens)
+        board.turn_color = self.turn_color
+        board.turn_count = self.turn_count
+        board._history = []
+        board._feature_history = []
+        board.frontiers = list(self.frontiers)
+        board.fills = self.fills
+        board.dead = self.dead
+        return board
+
+    def apply(self, move_id: int):
+        color = self.turn_color
+        red_frontier, blue_frontier = self.frontiers
+        self._feature_history.append(
+            (red_frontier, blue_frontier, self.fills, self.dead)
+        )
+        super().apply(move_id)
+        if self.last_move_cleared():
+            self.refresh()
+            return
+
+        mask = PLACEMENT_MASKS[move_id]
+        empty = FULL_MASK & ~self.occupied
+        self.frontiers[color] = (
+            self.frontiers[color] | PLACEMENT_NEIGHBOURS[move_id]
+        ) & empty
+        self.frontiers[color.opponent] &= ~mask
+        self.fills += PLACEMENT_FILLS[move_id]
+        # only cells next to the piece lost empty neighbours
+        self.dead |= dead_cells(empty, PLACEMENT_NEIGHBOURS[move_id] & empty)
+
+    def undo(self):
+        super().undo()
+        red_frontier, blue_frontier, fills, dead = self._feature_history.pop()
+        self.frontiers = [red_frontier, blue_frontier]
+        self.fills = fills
+        self.dead = dead
+
+    def near_full_lines(self) -> int:
+        """
+        Number of rows and columns filled to at least NEAR_FULL
+        """
+        return ((self.fills + _NEAR_OFFSET) & _FIELD_TOP).bit_count()
+
+    def room(self, color: PlayerColor) -> int:
+        """
+        Frontier cells a piece could still grow into, a cheap mobility estimate
+        """
+        return (self.frontiers[color] & ~self.dead).bit_count()
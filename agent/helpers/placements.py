@@ -0,0 +1,149 @@
+from .tetrominoes import make_tetrominoes
+from referee.game.actions import Action
+from referee.game.board import CellState
+from referee.game.constants import BOARD_N
+from referee.game.coord import Coord, Direction
+from referee.game.player import PlayerColor
+
+# Every tetromino placement on the board gets a fixed integer id, so that
+# moves can be stored compactly (shared arrays, statistics tables, books).
+# There are 19 fixed tetrominoes * 121 cells = 2299 distinct placements.
+
+
+def cell_index(coord: Coord) -> int:
+    """
+    Get the bit index of a coordinate
+    """
+    return coord.r * BOARD_N + coord.c
+
+
+def coords_mask(coords: list[Coord]) -> int:
+    """
+    Get the bit mask covering the given coordinates
+    """
+    mask = 0
+    for coord in coords:
+        mask |= 1 << cell_index(coord)
+    return mask
+
+
+def _make_placements() -> list[Action]:
+    """
+    Enumerate every placement once, in a fixed (sorted) order
+    """
+    seen: dict[frozenset[Coord], Action] = {}
+    for r in range(BOARD_N):
+        for c in range(BOARD_N):
+            for action in make_tetrominoes(Coord(r, c)):
+                key = frozenset(action.coords)
+                if key not in seen:
+                    seen[key] = Action(*sorted(key))
+    return sorted(seen.values(), key=lambda action: action.coords)
+
+
+PLACEMENTS: list[Action] = _make_placements()
+NUM_PLACEMENTS = len(PLACEMENTS)
+
+# id -> bit mask of the four cells covered
+PLACEMENT_MASKS: list[int] = [coords_mask(action.coords) for action in PLACEMENTS]
+
+# id -> bit mask of the cells touching (but not covered by) the placement
+PLACEMENT_NEIGHBOURS: list[int] = [
+    coords_mask([coord + dir for coord in action.coords for dir in Direction])
+    & ~PLACEMENT_MASKS[i]
+    for i, action in enumerate(PLACEMENTS)
+]
+
+# cell index -> ids of all placements covering that cell
+CELL_PLACEMENTS: list[list[int]] = [[] for _ in range(BOARD_N * BOARD_N)]
+for _id, _mask in enumerate(PLACEMENT_MASKS):
+    for _cell in range(BOARD_N * BOARD_N):
+        if _mask >> _cell & 1:
+            CELL_PLACEMENTS[_cell].append(_id)
+
+# board geometry masks
+FULL_MASK = (1 << (BOARD_N * BOARD_N)) - 1
+ROW_MASKS: list[int] = [
+    coords_mask([Coord(r, c) for c in range(BOARD_N)]) for r in range(BOARD_N)
+]
+COL_MASKS: list[int] = [
+    coords_mask([Coord(r, c) for r in range(BOARD_N)]) for c in range(BOARD_N)
+]
+CELL_NEIGHBOURS: list[int] = [
+    coords_mask([Coord(i // BOARD_N, i % BOARD_N) + dir for dir in Direction])
+    for i in range(BOARD_N * BOARD_N)
+]
+
+# id -> masks of the rows and columns a placement touches
+PLACEMENT_LINES: list[list[int]] = [
+    [line for line in ROW_MASKS + COL_MASKS if mask & line]
+    for mask in PLACEMENT_MASKS
+]
+
+_PLACEMENT_IDS: dict[frozenset[Coord], int] = {
+    frozenset(action.coords): i for i, action in enumerate(PLACEMENTS)
+}
+
+
+def action_id(action: Action) -> int:
+    """
+    Get the global placement id of an action (coordinate order is ignored)
+    """
+    return _PLACEMENT_IDS[frozenset(action.coords)]
+
+
+def id_action(placement_id: int) -> Action:
+    """
+    Get the action for a global placement id
+    """
+    return PLACEMENTS[placement_id]
+
+
+def state_masks(state: dict[Coord, CellState], color: PlayerColor) -> tuple[int, int]:
+    """
+    Get the (own, opponent) token masks of a state for the given colour
+    """
+    own = 0
+    opp = 0
+    for coord, cell in state.items():
+        if cell.player == color:
+            own |= 1 << cell_index(coord)
+        elif cell.player is not None:
+            opp |= 1 << cell_index(coord)
+    return own, opp
+
+
+def frontier(tokens: int, empty: int) -> int:
+    """
+    Get the empty cells touching any of the given tokens
+    """
+    mask = 0
+    while tokens:
+        low = tokens & -tokens
+        mask |= CELL_NEIGHBOURS[low.bit_length() - 1]
+        tokens ^= low
+    return mask & empty
+
+
+def legal_ids(own: int, opp: int) -> set[int]:
+    """
+    Get the ids of all legal placements for the player owning `own`
+    Every legal placement covers at least one empty cell touching own tokens
+    """
+    occupied = own | opp
+    ids = set()
+    cell_mask = frontier(own, FULL_MASK & ~occupied)
+    while cell_mask:
+        low = cell_mask & -cell_mask
+        for placement_id in CELL_PLACEMENTS[low.bit_length() - 1]:
+            if not PLACEMENT_MASKS[placement_id] & occupied:
+                ids.add(placement_id)
+        cell_mask ^= low
+    return ids
+
+
+def count_legal(own: int, opp: int) -> int:
+    """
+    Count the legal placements for the player owning `own`
+    """
+    return len(legal_ids(own, opp))
@@ -0,0 +1,109 @@
+from math import exp
+
+from .placements import (
+    COL_MASKS,
+    FULL_MASK,
+    PLACEMENT_MASKS,
+    PLACEMENT_NEIGHBOURS,
+    ROW_MASKS,
+    action_id,
+    frontier,
+    state_masks,
+)
+from referee.game.actions import Action
+from referee.game.board import CellState
+from referee.game.constants import BOARD_N
+from referee.game.coord import Coord
+from referee.game.player import PlayerColor
+
+# Cheap move priors, used to decide which moves are worth searching first.
+# weights for: frontier gained, opponent frontier blocked, line progress
+PRIOR_WEIGHTS = (1.0, 0.5, 2.0)
+PRIOR_TEMPERATURE = 2.0  # softmax temperature turning priors into probabilities
+
+# id -> [(is column, line index, cells added)] for the lines a placement touches
+_PLACEMENT_LINES: list[list[tuple[int, int, int]]] = [
+    [
+        (axis, i, (mask & line).bit_count())
+        for axis, masks in enumerate((ROW_MASKS, COL_MASKS))
+        for i, line in enumerate(masks)
+        if mask & line
+    ]
+    for mask in PLACEMENT_MASKS
+]
+
+
+class PriorContext:
+    """
+    Masks of one position, computed once and shared by all its moves
+    """
+
+    def __init__(self, state: dict[Coord, CellState], color: PlayerColor):
+        self.own, self.opp = state_masks(state, color)
+        occupied = self.own | self.opp
+        self.empty = FULL_MASK & ~occupied
+        self.own_frontier = frontier(self.own, self.empty)
+        self.opp_frontier = frontier(self.opp, self.empty)
+        self.row_fill = [(occupied & row).bit_count() for row in ROW_MASKS]
+        self.col_fill = [(occupied & col).bit_count() for col in COL_MASKS]
+
+    def features(self, move_id: int) -> tuple[float, float, float]:
+        """
+        Get the prior features of a move
+        """
+        mask = PLACEMENT_MASKS[move_id]
+        empty = self.empty & ~mask
+        # empty cells we can grow into after the move, that we could not before
+        gained = (PLACEMENT_NEIGHBOURS[move_id] & empty & ~self.own_frontier)
+        # opponent growing cells we take away
+        blocked = mask & self.opp_frontier
+        return (
+            gained.bit_count(),
+            blocked.bit_count(),
+            self.line_progress(move_id),
+        )
+
+    def line_progress(self, move_id: int) -> float:
+        """
+        How close the rows and columns touched by a move get to clearing
+        """
+        progress = 0.0
+        fills = (self.row_fill, self.col_fill)
+        for axis, i, added in _PLACEMENT_LINES[move_id]:
+            filled = fills[axis][i] + added
+            progress += (filled / BOARD_N) ** 2 + (filled == BOARD_N)
+        return progress
+
+    def prior(self, move_id: int) -> float:
+        """
+        Weighted sum of the prior features of a move
+        """
+        return sum(w * f for w, f in zip(PRIOR_WEIGHTS, self.features(move_id)))
+
+
+def rank_actions(
+    state: dict[Coord, CellState], color: PlayerColor, actions: list[Action]
+) -> list[Action]:
+    """
+    Sort actions from most to least promising by their prior
+    """
+    context = PriorContext(state, color)
+    return sorted(actions, key=lambda a: context.prior(action_id(a)), reverse=True)
+
+
+def move_probabilities(
+    state: dict[Coord, CellState],
+    color: PlayerColor,
+    move_ids: list[int],
+    temperature: float = PRIOR_TEMPERATURE,
+) -> dict[int, float]:
+    """
+    Softmax of the priors of all moves of a position, in one pass sharing
+    the position's masks
+    """
+    context = PriorContext(state, color)
+    logits = [context.prior(move_id) / temperature for move_id in move_ids]
+    top = max(logits, default=0.0)
+    weights = [exp(logit - top) for logit in logits]
+    total = sum(weights)
+    return {move_id: w / total for move_id, w in zip(move_ids, weights)}
@@ -0,0 +1,95 @@
+from hashlib import blake2b
+
+from .placements import PLACEMENT_MASKS
+from referee.game.constants import BOARD_N
+
+# The board is a square torus: shifting it, rotating it or mirroring it does
+# not change the game. Positions equal under these 121 translations x 8 D4
+# transforms share one canonical form (the smallest token masks over all of
+# them) and so one hash, which lets an opening book store each position once.
+
+CELLS = BOARD_N * BOARD_N
+
+
+def _d4(r: int, c: int, k: int) -> tuple[int, int]:
+    """
+    Apply the k-th rotation/reflection (0-7) to a cell
+    """
+    if k & 4:
+        r, c = c, r
+    for _ in range(k & 3):
+        r, c = c, (-r) % BOARD_N
+    return r, c
+
+
+def _make_transforms() -> list[list[int]]:
+    transforms = []
+    for k in range(8):
+        for dr in range(BOARD_N):
+            for dc in range(BOARD_N):
+                cell_map = []
+                for i in range(CELLS):
+                    r, c = _d4(i // BOARD_N, i % BOARD_N, k)
+                    cell_map.append((r + dr) % BOARD_N * BOARD_N + (c + dc) % BOARD_N)
+                transforms.append(cell_map)
+    return transforms
+
+
+# transform index -> cell index -> transformed cell index
+TRANSFORMS: list[list[int]] = _make_transforms()
+_TRANSFORM_IDS: dict[tuple[int, ...], int] = {
+    tuple(cell_map): i for i, cell_map in enumerate(TRANSFORMS)
+}
+# transform index -> index of the transform undoing it
+INVERSES: list[int] = [
+    _TRANSFORM_IDS[tuple(sorted(range(CELLS), key=cell_map.__getitem__))]
+    for cell_map in TRANSFORMS
+]
+_PLACEMENT_BY_MASK: dict[int, int] = {
+    mask: i for i, mask in enumerate(PLACEMENT_MASKS)
+}
+
+
+def transform_mask(mask: int, transform: int) -> int:
+    """
+    Move every cell of a mask with the given transform
+    """
+    cell_map = TRANSFORMS[transform]
+    result = 0
+    while mask:
+        low = mask & -mask
+        result |= 1 << cell_map[low.bit_length() - 1]
+        mask ^= low
+    return result
+
+
+def transform_move(move_id: int, transform: int) -> int:
+    """
+    Get the placement a transform turns the given placement into
+    """
+    return _PLACEMENT_BY_MASK[transform_mask(PLACEMENT_MASKS[move_id], transform)]
+
+
+def canonical(own: int, opp: int) -> tuple[int, int, int]:
+    """
+    Get the canonical (own, opp) masks of a position and the transform
+    leading there from the given masks
+    """
+    best = (own, opp, 0)
+    for transform in range(1, len(TRANSFORMS)):
+        key = transform_mask(own, transform)
+        if key > best[0]:
+            continue
+        other = transform_mask(opp, transform)
+        if (key, other) < best[:2]:
+            best = (key, other, transform)
+    return best
+
+
+def position_hash(own: int, opp: int, turn_count: int) -> int:
+    """
+    64 bit hash of canonical masks (from the view of the player to move)
+    """
+    data = own.to_bytes(16, "little") + opp.to_bytes(16, "little")
+    digest = blake2b(data + bytes([turn_count]), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
@@ -0,0 +1,91 @@
+import random
+
+from referee.game.constants import BOARD_N, MAX_TURNS
+
+# Zobrist hashing of FastBoard positions and a fixed size transposition table
+# for the alpha-beta searches. A position's key is the XOR of one random
+# 64 bit number per (colour, occupied cell), one for the turn count (the
+# turn limit makes it part of the position) and one if blue is to move.
+# Keys are updated from the token masks before and after a move, so line
+# clears need no special case.
+
+CELLS = BOARD_N * BOARD_N
+TABLE_BITS = 18  # 2^18 slots
+
+# bound types of stored values
+EXACT = 0
+LOWER = 1  # value is at least the stored one (beta cutoff)
+UPPER = 2  # value is at most the stored one (failed low)
+
+_rng = random.Random(30024)
+CELL_KEYS: list[list[int]] = [
+    [_rng.getrandbits(64) for _ in range(CELLS)] for _ in range(2)
+]
+TURN_KEYS: list[int] = [_rng.getrandbits(64) for _ in range(MAX_TURNS + 2)]
+BLUE_KEY: int = _rng.getrandbits(64)
+
+
+def _mask_key(mask: int, keys: list[int]) -> int:
+    key = 0
+    while mask:
+        low = mask & -mask
+        key ^= keys[low.bit_length() - 1]
+        mask ^= low
+    return key
+
+
+def zobrist_key(red: int, blue: int, blue_to_move: bool, turn_count: int) -> int:
+    """
+    Key of a position from scratch
+    """
+    key = _mask_key(red, CELL_KEYS[0]) ^ _mask_key(blue, CELL_KEYS[1])
+    key ^= TURN_KEYS[turn_count]
+    return key ^ BLUE_KEY if blue_to_move else key
+
+
+def zobrist_update(
+    key: int, before: tuple[int, int], after: list[int], turn_count: int
+) -> int:
+    """
+    Key after one move, from the token masks before and after it and the
+    turn count before it
+    """
+    key ^= _mask_key(before[0] ^ after[0], CELL_KEYS[0])
+    key ^= _mask_key(before[1] ^ after[1], CELL_KEYS[1])
+    key ^= TURN_KEYS[turn_count] ^ TURN_KEYS[turn_count + 1]
+    return key ^ BLUE_KEY
+
+
+class TranspositionTable:
+    """
+    Slots indexed by the low key bits, each holding
+    (key, depth, value, bound, best move); deeper results win a slot
+    """
+
+    def __init__(self, bits: int = TABLE_BITS):
+        self.mask = (1 << bits) - 1
+        self.slots: list[tuple[int, int, float, int, int] | None] = [None] * (
+            1 << bits
+        )
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int) -> tuple[int, int, float, int, int] | None:
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, value: float, bound: int, move: int):
+        index = key & self.mask
+        old = self.slots[index]
+        if old is None or old[0] != key or depth >= old[1]:
+            self.slots[index] = (key, depth, value, bound, move)
+
+    def clear(self):
+        self.slots = [None] * (self.mask + 1)
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
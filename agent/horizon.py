@@ -0,0 +1,161 @@
+from .deadline import Deadline, SearchTimeout
+from .telemetry import debug
+from .helpers.fast_board import FastBoard
+from .helpers.placements import PLACEMENT_LINES, PLACEMENT_MASKS
+from .helpers.transposition import (
+    EXACT,
+    LOWER,
+    UPPER,
+    TranspositionTable,
+    zobrist_key,
+    zobrist_update,
+)
+from referee.game.constants import MAX_TURNS
+from referee.game.player import PlayerColor
+
+# Turn-limit search: in the last plies before MAX_TURNS the game goes to
+# whoever has more tokens at the limit (unless someone gets stuck before), so
+# rollouts judged by mobility are the wrong tool. Iterative deepening
+# alpha-beta over the exact token difference instead, searching to the turn
+# limit when time allows and judging the current token difference otherwise.
+# Moves clearing lines come first: they swing the token count the most.
+# The transposition table is kept across moves (keys include the turn), so
+# each search starts from the previous one's results.
+
+HORIZON_PLIES = 10  # plies before the turn limit at which the mode starts
+STUCK_SCORE = 1000  # a player who cannot move loses whatever the tokens
+
+
+class HorizonSearch:
+    """
+    Alpha-beta on the token difference at the turn limit
+    """
+
+    def __init__(self):
+        self.table = TranspositionTable()
+        self.nodes = 0
+        self.depth = 0  # last completed depth
+        self.score = 0  # token lead expected by the last search
+
+    def best_move(self, board: FastBoard, budget: float) -> int | None:
+        """
+        Search deeper until the turn limit is reached or time runs out
+        Return the best move of the deepest completed search
+        """
+        board = board.copy()
+        key = zobrist_key(
+            board.tokens[0],
+            board.tokens[1],
+            board.turn_color == PlayerColor.BLUE,
+            board.turn_count,
+        )
+        self.nodes = 0
+        self.depth = 0
+        best = None
+        try:
+            with Deadline(budget) as deadline:
+                for depth in range(1, MAX_TURNS - board.turn_count + 1):
+                    self.score = self.negamax(
+                        board, key, depth, -STUCK_SCORE, STUCK_SCORE, deadline
+                    )
+                    entry = self.table.probe(key)
+                    if entry is not None and entry[4] >= 0:
+                        best = entry[4]
+                    self.depth = depth
+                    if abs(self.score) >= STUCK_SCORE:
+                        break
+        except SearchTimeout:
+            pass
+        return best
+
+    def negamax(
+        self,
+        board: FastBoard,
+        key: int,
+        depth: int,
+        alpha: int,
+        beta: int,
+        deadline: Deadline,
+    ) -> int:
+        """
+        Token lead of the player to move within [alpha, beta]
+        """
+        self.nodes += 1
+        deadline.check()
+        if board.turn_count >= MAX_TURNS:
+            # the game ends on the token count, whoever could still move
+            return self.token_lead(board)
+        if not board.has_move(board.turn_color):
+            return -STUCK_SCORE
+        if depth == 0:
+            return self.token_lead(board)
+
+        entry = self.table.probe(key)
+        table_move = -1
+        if entry is not None:
+            _, stored_depth, value, bound, table_move = entry
+            if stored_depth >= depth and (
+                bound == EXACT
+                or bound == LOWER and value >= beta
+                or bound == UPPER and value <= alpha
+            ):
+                return int(value)
+
+        original_alpha = alpha
+        best = -STUCK_SCORE
+        best_move = -1
+        for move in self.ordered_moves(board, table_move):
+            before = (board.tokens[0], board.tokens[1])
+            board.apply(move)
+            child = zobrist_update(key, before, board.tokens, board.turn_count - 1)
+            value = -self.negamax(board, child, depth - 1, -beta, -alpha, deadline)
+            board.undo()
+            if value > best:
+                best = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        bound = EXACT
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        self.table.store(key, depth, best, bound, best_move)
+        return best
+
+    def ordered_moves(self, board: FastBoard, table_move: int) -> list[int]:
+        """
+        Table move, then by opponent tokens a line clear would take off,
+        then by own tokens kept
+        """
+        occupied = board.occupied
+        opp = board.tokens[board.turn_color.opponent]
+        own = board.tokens[board.turn_color]
+
+        def swing(move: int) -> tuple[bool, int]:
+            mask = PLACEMENT_MASKS[move]
+            filled = occupied | mask
+            cleared = 0
+            for line in PLACEMENT_LINES[move]:
+                if filled & line == line:
+                    cleared |= line
+            return (
+                move == table_move,
+                (cleared & opp).bit_count() - ((own | mask) & cleared).bit_count(),
+            )
+
+        moves = board.legal_moves()
+        moves.sort(key=swing, reverse=True)
+        return moves
+
+    def token_lead(self, board: FastBoard) -> int:
+        color = board.turn_color
+        return board.token_count(color) - board.token_count(color.opponent)
+
+    def report(self):
+        debug(
+            f"horizon: depth {self.depth}, {self.nodes} nodes, "
+            f"lead {self.score}, table hits {self.table.hit_rate():.0%}"
+        )
@@ -0,0 +1,403 @@
+import random
+from collections import OrderedDict
+from math import log
+from time import process_time as timer
+from typing import TYPE_CHECKING
+
+from .deadline import Deadline, SearchTimeout
+from .evaluation import EVALUATORS, predicted_winner
+from .playouts import POLICIES, playout
+from .telemetry import debug
+from .time_manager import SETTLE_INTERVAL, root_settled
+from .helpers.fast_board import FastBoard
+from .helpers.placements import action_id, id_action
+from referee.game.actions import Action
+from referee.game.constants import MAX_TURNS
+from referee.game.player import PlayerColor
+
+if TYPE_CHECKING:
+    from .memory import Graveyard, MemoryGovernor
+
+# Board-free MCTS: nodes only store the move that reaches them. The search
+# keeps one working board, applying moves on the way down and undoing them
+# on the way back up. Boards of the most visited nodes are cached so that
+# any node's position can be rebuilt without replaying from the root.
+
+BOARD_CACHE_SIZE = 256
+CACHE_MIN_VISITS = 20
+
+
+class LeanNode:
+    """
+    Tree node holding only its move and statistics
+    """
+
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move: int, parent: "LeanNode | None" = None):
+        self.move: int = move  # placement id leading here, -1 for the root
+        self.parent: LeanNode | None = parent
+        self.children: dict[int, LeanNode] = {}
+        self.untried: list[int] | None = None  # filled on first expansion
+        self.visits: int = 0
+        self.wins: float = 0.0  # for the player who moved into this node
+
+    def best_child(self, c_param=1.4) -> "LeanNode":
+        """
+        Select the best child node based on the UCB1 formula
+        """
+        log_visits = log(self.visits) if self.visits > 0 else 0.0
+        best_score = float("-inf")
+        best = None
+        for child in self.children.values():
+            if child.visits == 0:
+                return child
+            score = child.wins / child.visits + c_param * (
+                log_visits / child.visits
+            ) ** 0.5
+            if score > best_score:
+                best_score = score
+                best = child
+        return best  # type: ignore
+
+    def release(self):
+        """
+        Cut the links of a discarded node, return its children
+        """
+        children = self.children.values()
+        self.children = {}
+        self.parent = None
+        return children
+
+    def max_depth(self) -> int:
+        """
+        Depth of the deepest node below this node
+        """
+        deepest = 0
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            deepest = max(deepest, depth)
+            stack.extend((child, depth + 1) for child in node.children.values())
+        return deepest
+
+    def subtree_size(self) -> int:
+        """
+        Number of nodes below (and including) this node
+        """
+        size = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.children.values())
+        return size
+
+
+class LeanSearch:
+    """
+    MCTS over board-free nodes with a single working board
+    """
+
+    NODE_BYTES = 450  # rough size of a node with its children dict
+
+    def __init__(
+        self,
+        board: FastBoard,
+        cache_size: int = BOARD_CACHE_SIZE,
+        playout: str = "random",
+        adaptive_cutoff: bool = False,
+        evaluation: str = "mobility",
+    ):
+        self.evaluate, board_class = EVALUATORS[evaluation]
+        board = board_class(*board.tokens, board.turn_color, board.turn_count)
+        self.root = LeanNode(-1)
+        self.root_board = board.copy()
+        self.board = board.copy()  # working board, always back at the root
+        self.cache: OrderedDict[LeanNode, FastBoard] = OrderedDict()
+        self.cache_size = cache_size
+        self.policy = POLICIES[playout]
+        self.adaptive_cutoff = adaptive_cutoff
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # statistics of the last search, for telemetry
+        self.nodes_created = 0
+        self.sim_count = 0
+        self.search_time = 0.0
+        self.search_nodes = 0
+        self.reused_visits = 0  # visits the root had before the search
+        self.estimated_time: float = 0
+        self.frozen = False  # set by the memory governor: no new nodes
+        self.stopped_early = False  # last search ended on a settled root
+
+    def root_moves(self) -> list[int]:
+        return self.board.legal_moves()
+
+    def best_action(
+        self,
+        steps=MAX_TURNS,
+        sim_no=100,
+        governor: "MemoryGovernor | None" = None,
+    ) -> Action | None:
+        """
+        Perform MCTS search for the best action
+        """
+        sim_count = 0
+        start_time = timer()
+        created = self.nodes_created
+        self.reused_visits = self.root.visits
+        self.stopped_early = False
+        with Deadline(self.estimated_time) as deadline:
+            for _ in range(sim_no):
+                if deadline.expired():
+                    break
+                if sim_count and sim_count % SETTLE_INTERVAL == 0:
+                    elapsed = timer() - start_time
+                    if self.settled(sim_no - sim_count, elapsed, sim_count):
+                        self.stopped_early = True
+                        break
+                try:
+                    self.simulate(steps, deadline)
+                except SearchTimeout:
+                    break
+                sim_count += 1
+                if governor:
+                    governor.tick(self)
+        self.sim_count = sim_count
+        self.search_time = timer() - start_time
+        self.search_nodes = self.nodes_created - created
+
+        debug(
+            "sim_count: ", sim_count,
+            "interrupted: ", deadline.interrupts,
+            "stopped early: ", self.stopped_early,
+        )
+        if sim_count > 0:
+            debug("average time per simulation: ", (timer() - start_time) / sim_count)
+        if not self.root.children:
+            print("ERROR: No best child found")
+            return None
+        best = max(self.root.children.values(), key=lambda child: child.visits)
+        action = id_action(best.move)
+        debug("best action: ", action)
+        return action
+
+    def settled(self, sims_left: int, elapsed: float, sim_count: int) -> bool:
+        """
+        Check if more simulations could still change the chosen root move
+        """
+        if self.root.untried is None or self.root.untried:
+            return False
+        time_per_sim = elapsed / sim_count
+        remaining = min(
+            sims_left, int((self.estimated_time - elapsed) / time_per_sim) + 1
+        )
+        return root_settled(
+            [
+                (child.visits, child.wins / child.visits if child.visits else 0.0)
+                for child in self.root.children.values()
+            ],
+            remaining,
+        )
+
+    def simulate(self, steps: int, deadline: Deadline | None = None):
+        """
+        One select/expand/rollout/backprop iteration on the working board
+        If the deadline passes during the rollout, the iteration is dropped
+        (the working board is put back at the root) and SearchTimeout raised
+        """
+        board = self.board
+        node = self.root
+        depth = 0
+
+        # selection
+        while not board.game_over:
+            if self.frozen and not node.children:
+                break
+            if node.untried is None:
+                node.untried = board.legal_moves()
+            if node.untried and not self.frozen:
+                # expansion
+                move = node.untried.pop(random.randrange(len(node.untried)))
+                child = LeanNode(move, node)
+                node.children[move] = child
+                self.nodes_created += 1
+                board.apply(move)
+                node = child
+                depth += 1
+                break
+            node = node.best_child()
+            board.apply(node.move)
+            depth += 1
+
+        # rollout, steps-1 due to the expanded move
+        try:
+            winner = self.rollout(steps - 1, deadline)
+        except SearchTimeout:
+            for _ in range(depth):
+                board.undo()
+            raise
+
+        # backpropagation, undoing the path on the way up
+        while True:
+            node.visits += 1
+            mover = board.turn_color.opponent
+            if winner is None:
+                node.wins += 0.5
+            elif winner == mover:
+                node.wins += 1
+            if node.visits >= CACHE_MIN_VISITS and node is not self.root:
+                self.remember(node, board)
+            if node is self.root:
+                break
+            board.undo()
+            node = node.parent  # type: ignore
+
+    def rollout(
+        self, max_steps: int, deadline: Deadline | None = None
+    ) -> PlayerColor | None:
+        """
+        Policy playout on the working board, undone before returning
+        (or raising SearchTimeout)
+        Return the (predicted) winner
+        """
+        board = self.board
+        start = board.turn_count
+        try:
+            playout(board, self.policy, max_steps, deadline, self.adaptive_cutoff)
+            winner = predicted_winner(board, self.evaluate)
+        finally:
+            for _ in range(board.turn_count - start):
+                board.undo()
+        return winner
+
+    def remember(self, node: LeanNode, board: FastBoard):
+        """
+        Cache the board of a frequently visited node
+        """
+        if node in self.cache:
+            self.cache.move_to_end(node)
+            return
+        self.cache[node] = board.copy()
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def board_of(self, node: LeanNode) -> FastBoard:
+        """
+        Materialise the board of any node: start from the nearest cached
+        ancestor (or the root) and replay the moves below it
+        """
+        moves = []
+        current: LeanNode | None = node
+        start = None
+        while current is not None and current is not self.root:
+            start = self.cache.get(current)
+            if start is not None:
+                self.cache_hits += 1
+                break
+            moves.append(current.move)
+            current = current.parent
+        if start is None:
+            self.cache_misses += 1
+            start = self.root_board
+        board = start.copy()
+        for move in reversed(moves):
+            board.apply(move)
+        return board
+
+    def search_stats(self, action: Action) -> dict:
+        """
+        Telemetry fields of the last search
+        """
+        child = self.root.children.get(action_id(action))
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "simulations": self.sim_count,
+            "reused_visits": self.reused_visits,
+            "nodes_created": self.search_nodes,
+            "tree_size": self.tree_size(),
+            "max_depth": self.root.max_depth(),
+            "rollouts_per_sec": (
+                self.sim_count / self.search_time if self.search_time else None
+            ),
+            "cache_hit_rate": self.cache_hits / lookups if lookups else None,
+            "visit_share": (
+                child.visits / self.root.visits
+                if child and self.root.visits
+                else None
+            ),
+        }
+
+    def advance(self, action: Action, graveyard: "Graveyard"):
+        """
+        Make the child reached by an action the new root, keeping its
+        statistics, the old root and its other children go to the graveyard
+        """
+        move = action_id(action)
+        child = self.root.children.pop(move, None)
+        if child is None:
+            child = LeanNode(move, self.root)
+        board = self.board_of(child)
+        child.parent = None
+        graveyard.bury((self.root,))
+        self.root = child
+        self.sim_count = 0  # the last search was from the old root
+        self.root_board = board
+        self.board = board.copy()
+        # cached boards outside the new subtree are unreachable now
+        self.cache = OrderedDict(
+            (node, cached)
+            for node, cached in self.cache.items()
+            if self.is_in_tree(node)
+        )
+
+    def child_values(self, min_visits: int = 2) -> list[float]:
+        """
+        Mean results of the root's children visited at least min_visits times
+        """
+        return [
+            child.wins / child.visits
+            for child in self.root.children.values()
+            if child.visits >= min_visits
+        ]
+
+    def tree_size(self) -> int:
+        return self.root.subtree_size()
+
+    def prune(self, min_visits: int) -> int:
+        """
+        Drop every subtree below the root's children with fewer than
+        min_visits visits (their moves become untried again)
+        Return the nodes freed
+        """
+        freed = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for move, child in list(node.children.items()):
+                if node is not self.root and child.visits < min_visits:
+                    freed += child.subtree_size()
+                    del node.children[move]
+                    child.parent = None
+                    if node.untried is not None:
+                        node.untried.append(move)
+                else:
+                    stack.append(child)
+        if freed:
+            self.cache = OrderedDict(
+                (node, cached)
+                for node, cached in self.cache.items()
+                if self.is_in_tree(node)
+            )
+        return freed
+
+    def set_frozen(self, frozen: bool):
+        self.frozen = frozen
+
+    def is_in_tree(self, node: LeanNode) -> bool:
+        current: LeanNode | None = node
+        while current is not None:
+            if current is self.root:
+                return True
+            current = current.parent
+        return False
@@ -1,17 +1,67 @@
 import random
-from math import ceil, log
+from math import ceil, log, log2
 from collections import defaultdict
-from statistics import mean
+from dataclasses import dataclass
 
-from .helpers.movements import generate_random_move
+from .deadline import Deadline, SearchTimeout
+from .evaluation import EVALUATORS, predicted_winner
+from .playouts import POLICIES, playout
+from .telemetry import debug
+from .time_manager import SETTLE_INTERVAL, root_settled
+from .helpers.fast_board import FastBoard
+from .helpers.placements import action_id
+from .helpers.priors import (
+    PRIOR_TEMPERATURE,
+    PriorContext,
+    move_probabilities,
+    rank_actions,
+)
 from .helpers.sim_board import SimBoard, find_actions, update_actions
 from referee.game.actions import Action
 from referee.game.constants import MAX_TURNS
 from referee.game.player import PlayerColor
-from timeit import default_timer as timer
+from time import process_time as timer
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from .batch_eval import BatchEvaluator
+    from .memory import Graveyard, MemoryGovernor
 
-CLOSE_TO_END = 100
+
+HALVING_NOISE = 1.0  # scale of the Gumbel noise added to root priors
+FPU_REDUCTION = 0.0  # unvisited moves are valued this much below their parent
+
+
+@dataclass
+class SearchOptions:
+    """
+    Search settings shared by every node of a tree
+    """
+
+    rave: bool = False  # blend AMAF statistics into selection
+    rave_equivalence: float = 300  # visits at which AMAF and UCT weigh equally
+    # progressive widening: only the best base + factor * visits^exponent
+    # untried actions by prior are opened up
+    widening: bool = False
+    widening_base: int = 4
+    widening_factor: float = 2.0
+    widening_exponent: float = 0.5
+    # sequential halving at the root instead of UCB
+    halving: bool = False
+    halving_candidates: int = 16
+    # PUCT selection: exploration weighted by softmax move probabilities,
+    # replaces UCB1 and progressive widening
+    puct: bool = False
+    puct_c: float = 3.0
+    prior_temperature: float = PRIOR_TEMPERATURE
+    # rollout move policy, a name in playouts.POLICIES
+    playout: str = "random"
+    # stop rollouts early when decisive, extend them while volatile
+    adaptive_cutoff: bool = False
+    # rollout end evaluation, a name in evaluation.EVALUATORS
+    evaluation: str = "mobility"
+    # set by the memory governor: no new nodes, search the existing tree
+    expansion_frozen: bool = False
 
 
 class MCTSNode:
@@ -19,42 +69,44 @@ class MCTSNode:
     Node class for the Monte Carlo Tree Search algorithm
     """
 
+    NODE_BYTES = 6500  # rough size of a node with its board copy
+    nodes_created = 0  # by every tree in this process, for telemetry/memory
+
+    # statistics of the last search from this node (as root)
+    sim_count = 0
+    search_time = 0.0
+    search_nodes = 0
+    reused_visits = 0  # visits the root had before the search
+
     def __init__(
         self,
         board: SimBoard,
         parent: "MCTSNode | None" = None,
         parent_action: Action | None = None,
+        options: SearchOptions | None = None,
     ):
         """
         Initialize the node with the current board state
         """
+        MCTSNode.nodes_created += 1
         self.board: SimBoard = board
         self.parent: MCTSNode | None = parent
         self.parent_action: Action | None = parent_action
+        self.parent_id: int = action_id(parent_action) if parent_action else -1
 
-        self.my_actions: list[Action] = []
-        self.opp_actions: list[Action] = []
+        if options is None:
+            options = parent.options if parent else SearchOptions()
+        self.options: SearchOptions = options
 
-        # parent.parent: parent with same color
-        if parent:
-            self.opp_actions = update_actions(
-                parent.board.state, self.board.state, parent.my_actions, parent.color
-            )
-            if parent.parent:
-                self.my_actions = update_actions(
-                    parent.parent.board.state,
-                    self.board.state,
-                    parent.parent.my_actions,
-                    board.turn_color,
-                )
-        else:
-            self.my_actions = find_actions(board.state, board.turn_color)
-            self.opp_actions = find_actions(board.state, board.turn_color.opponent)
-            if len(self.my_actions) == 0:
-                print("ERROR: bit_find_actions returned no actions")
+        # legal actions are only worked out when first needed
+        self.__my_actions: list[Action] | None = None
+        self.__opp_actions: list[Action] | None = None
 
         # actions not yet tried
-        self.untried_actions = self.my_actions.copy()
+        self.__untried_actions: list[Action] | None = None
+        self.__untried_ranked = False
+        # placement id -> move probability, computed on first PUCT selection
+        self.__priors: dict[int, float] | None = None
 
         # my actions to child node
         self.__action_to_children: dict[Action, "MCTSNode"] = {}
@@ -66,7 +118,62 @@ class MCTSNode:
         self.results[1] = 0  # win
         self.results[-1] = 0  # lose
 
+        # all-moves-as-first statistics of this node's colour,
+        # placement id -> [wins, visits]
+        self.amaf: dict[int, list[int]] = {}
+
         self.estimated_time: float = 0
+        self.stopped_early = False  # last search ended on a settled root
+
+    @property
+    def my_actions(self) -> list[Action]:
+        """
+        Actions for this node's colour, computed on first use
+        """
+        if self.__my_actions is None:
+            parent = self.parent
+            # parent.parent: parent with same color
+            if parent and parent.parent:
+                self.__my_actions = update_actions(
+                    parent.parent.board.state,
+                    self.board.state,
+                    parent.parent.my_actions,
+                    self.color,
+                )
+            else:
+                self.__my_actions = find_actions(self.board.state, self.color)
+                if len(self.__my_actions) == 0 and not parent:
+                    print("ERROR: find_actions returned no actions")
+        return self.__my_actions
+
+    @property
+    def opp_actions(self) -> list[Action]:
+        """
+        Actions for the opponent's colour, computed on first use
+        """
+        if self.__opp_actions is None:
+            if self.parent:
+                self.__opp_actions = update_actions(
+                    self.parent.board.state,
+                    self.board.state,
+                    self.parent.my_actions,
+                    self.parent.color,
+                )
+            else:
+                self.__opp_actions = find_actions(
+                    self.board.state, self.color.opponent
+                )
+        return self.__opp_actions
+
+    @property
+    def untried_actions(self) -> list[Action]:
+        if self.__untried_actions is None:
+            self.__untried_actions = self.my_actions.copy()
+        return self.__untried_actions
+
+    @untried_actions.setter
+    def untried_actions(self, actions: list[Action]):
+        self.__untried_actions = actions
 
     def expansion(self, action: Action | None = None):
         """
@@ -75,7 +182,9 @@ class MCTSNode:
         """
         board_node: SimBoard = self.board.copy()
         if action is None:
-            if self.untried_actions:
+            if self.untried_actions and self.options.widening:
+                action = self.ranked_untried_actions()[0]
+            elif self.untried_actions:
                 action = random.choice(self.untried_actions)
             else:
                 return random.choice(list(self.__action_to_children.values()))
@@ -95,64 +204,140 @@ class MCTSNode:
     def is_fully_expanded(self):
         if not self.untried_actions:
             return True
+        if self.options.widening:
+            return len(self.__action_to_children) >= self.widening_limit()
         return False
 
-    def estimate_turns(self, times: int) -> int:
+    def widening_limit(self) -> int:
         """
-        Simulate a random v random game from the current node
-        Return the estimated turns required for us to finish the game
+        Number of children this node may have at its current visit count
         """
-        print("estimating turns")
-        push_steps = []
-        tried_times = 0
-        while tried_times != times:
-            current_node = self.tree_policy()
-            if not current_node:
-                break
-            current_board = current_node.board.copy()
-            this_push_step = 0
-            while not current_board.game_over:
-                current_board.apply_action(
-                    generate_random_move(current_board.state, current_board.turn_color)
+        return self.options.widening_base + ceil(
+            self.options.widening_factor
+            * self.num_visits**self.options.widening_exponent
+        )
+
+    def ranked_untried_actions(self) -> list[Action]:
+        """
+        Untried actions ordered by prior, ranked once on first use
+        """
+        if not self.__untried_ranked:
+            if self.options.puct:
+                priors = self.move_priors()
+                self.untried_actions.sort(
+                    key=lambda a: priors[action_id(a)], reverse=True
                 )
-                this_push_step += 1
-            # backpropagate the result
-            if current_board.winner_color == current_node.color:
-                current_node.results[1] += 1
             else:
-                current_node.results[-1] += 1
-            tried_times += 1
-            push_steps.append(this_push_step + 1)
-        print(push_steps)
-        avg = mean(push_steps)
-        result = ceil(avg / 2)  # half of the turns are ours
-        print(result)
-        return result
-
-    def new_rollout(self, max_steps) -> None:
-        """
-        Simulate a random v random game from the current node
-        not pushing all the way to the end of the game but stopping at max_steps
+                self.untried_actions = rank_actions(
+                    self.board.state, self.color, self.untried_actions
+                )
+            self.__untried_ranked = True
+        return self.untried_actions
+
+    def move_priors(self) -> dict[int, float]:
+        """
+        Probabilities of this node's actions, all computed at once on first use
         """
-        push_step = 0
-        current_board = self.board.copy()
-        while not current_board.game_over and push_step < max_steps:
-            current_board.apply_action(
-                generate_random_move(current_board.state, current_board.turn_color)
+        if self.__priors is None:
+            self.__priors = move_probabilities(
+                self.board.state,
+                self.color,
+                [action_id(action) for action in self.my_actions],
+                self.options.prior_temperature,
             )
-            push_step += 1
-        # backpropagate the result
-        if current_board.winner_color == self.color:
-            self.results[1] += 1
-            return
-        elif current_board.winner_color == self.color.opponent:
-            self.results[-1] += 1
-            return
-        end_node = MCTSNode(current_board)
-        if end_node.heuristics_judge() > 0 and self.color == end_node.color:
-            self.results[1] += 1
-        elif end_node.heuristics_judge() < 0 and self.color != end_node.color:
-            self.results[1] += 1
+        return self.__priors
+
+    def new_rollout(
+        self, max_steps, deadline: Deadline | None = None
+    ) -> tuple[PlayerColor | None, list[tuple[PlayerColor, int]]]:
+        """
+        Simulate a game from the current node with the playout policy
+        not pushing all the way to the end of the game but stopping at max_steps
+        Return the (predicted) winner and the placement ids played
+        Raise SearchTimeout if the deadline passes on the way
+        """
+        evaluate, board_class = EVALUATORS[self.options.evaluation]
+        board = board_class.from_sim_board(self.board)
+        colors = (board.turn_color, board.turn_color.opponent)
+        played = playout(
+            board,
+            POLICIES[self.options.playout],
+            max_steps,
+            deadline,
+            self.options.adaptive_cutoff,
+        )
+        moves = [(colors[i % 2], move) for i, move in enumerate(played)]
+        return predicted_winner(board, evaluate), moves
+
+    def backpropagate(
+        self,
+        winner: PlayerColor | None,
+        moves: list[tuple[PlayerColor, int]],
+        root: "MCTSNode",
+    ):
+        """
+        Update the statistics of every node from this one up to the root
+        """
+        played: list[tuple[PlayerColor, int]] = []
+        if self.options.rave:
+            played = list(moves)
+        node: MCTSNode | None = self
+        while node:
+            node.num_visits += 1
+            if winner == node.color:
+                node.results[1] += 1
+            elif winner is not None:
+                node.results[-1] += 1
+            if self.options.rave:
+                node.update_amaf(winner, played)
+            if node is root:
+                break
+            if node.parent and self.options.rave:
+                played.insert(0, (node.parent.color, node.parent_id))
+            node = node.parent
+
+    def virtual_visit(self, root: "MCTSNode"):
+        """
+        Count a visit on the path to the root before its result is known,
+        steering other selections away while the leaf waits for evaluation
+        """
+        node: MCTSNode | None = self
+        while node:
+            node.num_visits += 1
+            if node is root:
+                break
+            node = node.parent
+
+    def backpropagate_value(self, value: float, root: "MCTSNode"):
+        """
+        Add a fractional result, the win probability of this node's colour,
+        to every node up to the root (visits already counted)
+        """
+        node: MCTSNode | None = self
+        while node:
+            own = value if node.color == self.color else 1 - value
+            node.results[1] += own
+            node.results[-1] += 1 - own
+            if node is root:
+                break
+            node = node.parent
+
+    def update_amaf(
+        self, winner: PlayerColor | None, played: list[tuple[PlayerColor, int]]
+    ):
+        """
+        Count every move this node's colour played later in the simulation
+        as if it had been played first
+        """
+        seen = set()
+        for color, move_id in played:
+            if color != self.color or move_id in seen:
+                continue
+            seen.add(move_id)
+            stats = self.amaf.setdefault(move_id, [0, 0])
+            if winner == self.color:
+                stats[0] += 1
+            stats[1] += 1
 
     def best_child(self, c_param=1.4) -> "MCTSNode":
         """
@@ -171,6 +356,9 @@ class MCTSNode:
                     c_param * (log(self.num_visits) / child.num_visits) ** 0.5
                 )
 
+            if self.options.rave:
+                exploit = self.rave_value(child, exploit)
+
             score: float = exploit + explore
             if score > best_score:
                 best_score = score
@@ -181,98 +369,448 @@ class MCTSNode:
             exit()
         return best_child
 
+    def puct_child(self, expand: bool = True) -> "MCTSNode":
+        """
+        Select a child by PUCT: value plus exploration scaled by the move's
+        prior. The untried action with the highest prior competes as an
+        unvisited child and is expanded if it wins.
+        """
+        priors = self.move_priors()
+        explore = self.options.puct_c * max(1, self.num_visits) ** 0.5
+        # unvisited children start from the parent's own value
+        first_play = 0.0
+        if self.num_visits > 0:
+            first_play = self.results[1] / self.num_visits - FPU_REDUCTION
+
+        best_score: float = float("-inf")
+        best_child = None
+        for child in self.__action_to_children.values():
+            exploit = first_play
+            if child.num_visits > 0:
+                exploit = child.results[-1] / child.num_visits
+                if self.options.rave:
+                    exploit = self.rave_value(child, exploit)
+            score = exploit + explore * priors.get(child.parent_id, 0.0) / (
+                1 + child.num_visits
+            )
+            if score > best_score:
+                best_score = score
+                best_child = child
+
+        if expand and self.untried_actions:
+            action = self.ranked_untried_actions()[0]
+            if not best_child or first_play + explore * priors[
+                action_id(action)
+            ] > best_score:
+                return self.expansion(action)
+        if not best_child:
+            print("ERROR: No best child found")
+            exit()
+        return best_child
+
+    def rave_value(self, child: "MCTSNode", exploit: float) -> float:
+        """
+        Blend the child's own win rate with its move's AMAF win rate,
+        trusting AMAF less as the child gathers real visits
+        """
+        stats = self.amaf.get(child.parent_id)
+        if not stats or stats[1] == 0:
+            return exploit
+        k = self.options.rave_equivalence
+        beta = (k / (3 * child.num_visits + k)) ** 0.5
+        return (1 - beta) * exploit + beta * stats[0] / stats[1]
+
     def tree_policy(self) -> "MCTSNode | None":
         """
         Select a node to expand based on the tree policy
         """
-        # select nodes to expand
-        if not self.is_terminal_node():
-            if not self.is_fully_expanded():
-                return self.expansion()
-            else:
-                if not self.my_actions:
+        # descend through fully expanded nodes
+        node = self
+        while not node.is_terminal_node():
+            if self.options.expansion_frozen and not node.__action_to_children:
+                return node
+            if self.options.puct:
+                if not node.my_actions:
                     print("ERROR: No actions available")
                     return None
-                if self.__action_to_children:
-                    print("finish expanding, looking for best child")
-                    return self.best_child()
-        return self
+                child = node.puct_child(not self.options.expansion_frozen)
+                if child.num_visits == 0:
+                    # newly expanded leaf
+                    return child
+                node = child
+                continue
+            if not node.is_fully_expanded() and not self.options.expansion_frozen:
+                return node.expansion()
+            if not node.my_actions:
+                print("ERROR: No actions available")
+                return None
+            node = node.best_child()
+        return node
+
+    def simulate(self, steps=MAX_TURNS):
+        """
+        One select/expand/rollout/backprop iteration with this node as root
+        """
+        v: MCTSNode | None = self.tree_policy()
+        if v:
+            winner, moves = v.new_rollout(steps - 1)
+            v.backpropagate(winner, moves, self)
+
+    def is_winning_move(self) -> bool:
+        """
+        Check if the move into this node ends the game in the mover's favour
+        """
+        return (
+            self.is_terminal_node()
+            and self.board.winner_color == self.color.opponent
+        )
 
-    def best_action(self, steps=MAX_TURNS, sim_no=100) -> Action | None:
+    def parent_value(self) -> float:
+        """
+        Average result of this node for the player who moved into it
+        """
+        if self.num_visits <= 0:
+            return 0.0
+        draws = self.num_visits - self.results[1] - self.results[-1]
+        return (self.results[-1] + 0.5 * draws) / self.num_visits
+
+    def best_action(
+        self,
+        steps=MAX_TURNS,
+        sim_no=100,
+        governor: "MemoryGovernor | None" = None,
+        evaluator: "BatchEvaluator | None" = None,
+    ) -> Action | None:
         """
         Perform MCTS search for the best action
+        With an evaluator, leaves are queued for batched evaluation instead
+        of being rolled out
         """
+        if self.options.halving:
+            return self.sequential_halving(steps, sim_no, governor, evaluator)
+
         sim_count = 0
         start_time = timer()
-        # repeat until time is up or max simulations reached
-        for _ in range(sim_no):
-            if timer() - start_time > self.estimated_time:
-                break
-            # expansion
-            v: MCTSNode | None = self.tree_policy()
-            if not v:
-                print("ERROR: No tree policy node found")
-                return None
-            # if the move wins the game, cut the search directly
-            if v.is_terminal_node() and v.board.winner_color == self.color:
-                return v.parent_action
-            # simulation with heuristic and max_steps, 
-            # steps-1 due to picking node in tree_policy
-            v.new_rollout(steps - 1)
-            sim_count += 1
-        
-        print("sim_count: ", sim_count)
+        created = MCTSNode.nodes_created
+        self.reused_visits = self.num_visits
+        self.stopped_early = False
+        # repeat until time is up, max simulations reached or the root settles
+        with Deadline(self.estimated_time) as deadline:
+            for _ in range(sim_no):
+                if deadline.expired():
+                    break
+                if sim_count and sim_count % SETTLE_INTERVAL == 0:
+                    elapsed = timer() - start_time
+                    if self.settled(sim_no - sim_count, elapsed, sim_count):
+                        self.stopped_early = True
+                        break
+                # expansion
+                v: MCTSNode | None = self.tree_policy()
+                if not v:
+                    print("ERROR: No tree policy node found")
+                    return None
+                # if the move wins the game, cut the search directly
+                if v.parent is self and v.is_winning_move():
+                    if evaluator:
+                        evaluator.flush()
+                    self.record_search(sim_count, start_time, created)
+                    return v.parent_action
+                if evaluator and not v.is_terminal_node():
+                    v.virtual_visit(self)
+                    evaluator.submit(
+                        FastBoard.from_sim_board(v.board),
+                        lambda value, v=v: v.backpropagate_value(value, self),
+                    )
+                    sim_count += 1
+                    if governor:
+                        governor.tick(self)
+                    continue
+                # simulation with heuristic and max_steps,
+                # steps-1 due to picking node in tree_policy
+                try:
+                    winner, moves = v.new_rollout(steps - 1, deadline)
+                except SearchTimeout:
+                    break
+                v.backpropagate(winner, moves, self)
+                sim_count += 1
+                if governor:
+                    governor.tick(self)
+        if evaluator:
+            evaluator.flush()
+        self.record_search(sim_count, start_time, created)
+
+        debug(
+            "sim_count: ", sim_count,
+            "interrupted: ", deadline.interrupts,
+            "stopped early: ", self.stopped_early,
+        )
         if (sim_count > 0):
-            print("average time per simulation: ", (timer() - start_time) / sim_count)
+            debug("average time per simulation: ", (timer() - start_time) / sim_count)
+
+        if not self.__action_to_children:
+            print("ERROR: No best child found")
+            return None
 
-        # return best action
-        best_child = self.best_child(c_param=0.0)
+        # return best action, the most visited one under PUCT
+        if self.options.puct:
+            best_child = max(
+                self.__action_to_children.values(), key=lambda c: c.num_visits
+            )
+        else:
+            best_child = self.best_child(c_param=0.0)
         if best_child:
-            print("best action: ", best_child.parent_action)
+            debug("best action: ", best_child.parent_action)
             return best_child.parent_action
 
         # if no best child, print error + return None
         print("ERROR: No best child found")
         return None
 
-    def heuristics_judge(self) -> float:
+    def settled(self, sims_left: int, elapsed: float, sim_count: int) -> bool:
         """
-        heuristic function to predict if this player is winning
+        Check if more simulations could still change the chosen root action
         """
-        result = len(self.my_actions) - len(self.opp_actions)
-        # let the number of tokens be the tie breaker if the turn_count is close to the max
-        if self.board.turn_count > CLOSE_TO_END:
-            result += (
-                self.board._player_token_count(self.color)
-                - self.board._player_token_count(self.color.opponent)
-            ) / (MAX_TURNS - self.board.turn_count + 1)
-        return result
+        # actions still to be opened up could take over, under PUCT they are
+        # unvisited and only the visit counts decide
+        if not self.options.puct and not self.is_fully_expanded():
+            return False
+        time_per_sim = elapsed / sim_count
+        remaining = min(
+            sims_left, int((self.estimated_time - elapsed) / time_per_sim) + 1
+        )
+        return root_settled(
+            [
+                (child.num_visits, child.parent_value())
+                for child in self.__action_to_children.values()
+            ],
+            remaining,
+        )
 
-    def chop_nodes_except(self, node: "MCTSNode | None" = None):
+    def sequential_halving(
+        self,
+        steps=MAX_TURNS,
+        sim_no=100,
+        governor: "MemoryGovernor | None" = None,
+        evaluator: "BatchEvaluator | None" = None,
+    ) -> Action | None:
         """
-        To free up memory, delele all useless nodes
-        need to call gc.collect() after this function
-        params: node to keep as it will be the new root
+        Root search for small budgets: spread the simulations evenly over a
+        shrinking set of candidate actions, keeping the better half after each
+        round. Candidates are picked by prior plus Gumbel noise, the tree
+        below each candidate is searched as usual (leaves batch-evaluated
+        with an evaluator, flushed before the candidates are compared).
         """
-        if node:
-            # main branch
-            for child in self.__action_to_children.values():
-                # child node to keep, all children of this node will be saved
-                if node and child == node:
-                    continue
+        if not self.my_actions:
+            print("ERROR: No actions available")
+            return None
+
+        context = PriorContext(self.board.state, self.color)
+        scores: dict[Action, float] = {
+            action: context.prior(action_id(action))
+            - HALVING_NOISE * log(-log(random.random() or 1e-12))
+            for action in self.my_actions
+        }
+        candidates = sorted(self.my_actions, key=scores.__getitem__, reverse=True)
+        candidates = candidates[: self.options.halving_candidates]
+        rounds = max(1, ceil(log2(len(candidates))))
+
+        sim_count = 0
+        start_time = timer()
+        created = MCTSNode.nodes_created
+        self.reused_visits = self.num_visits
+        out_of_time = False
+        deadline = Deadline(self.estimated_time)
+        with deadline:
+            while len(candidates) > 1 and not out_of_time:
+                per_candidate = max(1, sim_no // (rounds * len(candidates)))
+                for action in candidates:
+                    child = self.get_child(action)
+                    for _ in range(per_candidate):
+                        if deadline.expired():
+                            out_of_time = True
+                            break
+                        if child.is_winning_move():
+                            if evaluator:
+                                evaluator.flush()
+                            self.record_search(sim_count, start_time, created)
+                            return action
+                        v: MCTSNode | None = child.tree_policy()
+                        if not v:
+                            break
+                        if evaluator and not v.is_terminal_node():
+                            v.virtual_visit(self)
+                            evaluator.submit(
+                                FastBoard.from_sim_board(v.board),
+                                lambda value, v=v: v.backpropagate_value(value, self),
+                            )
+                            sim_count += 1
+                            if governor:
+                                governor.tick(self)
+                            continue
+                        try:
+                            winner, moves = v.new_rollout(steps - 1, deadline)
+                        except SearchTimeout:
+                            out_of_time = True
+                            break
+                        v.backpropagate(winner, moves, self)
+                        sim_count += 1
+                        if governor:
+                            governor.tick(self)
+                    if out_of_time:
+                        break
+                if evaluator:
+                    evaluator.flush()
+                # keep the better half, prior breaks ties
+                candidates.sort(
+                    key=lambda a: (self.get_child(a).parent_value(), scores[a]),
+                    reverse=True,
+                )
+                if not out_of_time:
+                    candidates = candidates[: ceil(len(candidates) / 2)]
+
+        self.record_search(sim_count, start_time, created)
+        debug("sim_count: ", sim_count, "interrupted: ", deadline.interrupts)
+        if sim_count > 0:
+            debug("average time per simulation: ", (timer() - start_time) / sim_count)
+        debug("best action: ", candidates[0])
+        return candidates[0]
+
+    def record_search(self, sim_count: int, start_time: float, created: int):
+        """
+        Keep the numbers of the search just finished for telemetry
+        """
+        self.sim_count = sim_count
+        self.search_time = timer() - start_time
+        self.search_nodes = MCTSNode.nodes_created - created
+
+    def search_stats(self, action: Action) -> dict:
+        """
+        Telemetry fields of the last search from this (root) node
+        """
+        child = self.__action_to_children.get(action)
+        return {
+            "simulations": self.sim_count,
+            "reused_visits": self.reused_visits,
+            "nodes_created": self.search_nodes,
+            "tree_size": self.tree_size(),
+            "max_depth": self.max_depth(),
+            "rollouts_per_sec": (
+                self.sim_count / self.search_time if self.search_time else None
+            ),
+            "visit_share": (
+                child.num_visits / self.num_visits
+                if child and self.num_visits
+                else None
+            ),
+        }
+
+    def advance(self, action: Action, graveyard: "Graveyard") -> "MCTSNode":
+        """
+        Make the child reached by an action the new root, keeping its
+        statistics, in O(1): the other children go to the graveyard to be
+        freed later, this node stays as the new root's parent (its children
+        update their actions from it) and the roots above it are dropped
+        """
+        child = self.__action_to_children.pop(action, None)
+        if child is None:
+            # never tried: a bare node, its actions are worked out when needed
+            board = self.board.copy()
+            board.apply_action(action)
+            child = MCTSNode(board, parent=self, parent_action=action)
+        graveyard.bury(self.__action_to_children.values())
+        self.__action_to_children = {action: child}
+        if self.parent:
+            self.parent.parent = None
+        return child
+
+    def release(self):
+        """
+        Cut the links of a discarded node, return its children
+        """
+        children = self.__action_to_children.values()
+        self.__action_to_children = {}
+        self.parent = None
+        return children
+
+    def child_values(self, min_visits: int = 2) -> list[float]:
+        """
+        Mean results of the children visited at least min_visits times
+        """
+        return [
+            child.parent_value()
+            for child in self.__action_to_children.values()
+            if child.num_visits >= min_visits
+        ]
+
+    def tree_size(self) -> int:
+        """
+        Number of nodes in the subtree below (and including) this node
+        """
+        size = 0
+        stack: list[MCTSNode] = [self]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.__action_to_children.values())
+        return size
+
+    def max_depth(self) -> int:
+        """
+        Depth of the deepest node below this node
+        """
+        deepest = 0
+        stack: list[tuple[MCTSNode, int]] = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            deepest = max(deepest, depth)
+            stack.extend(
+                (child, depth + 1) for child in node.__action_to_children.values()
+            )
+        return deepest
+
+    def prune(self, min_visits: int) -> int:
+        """
+        Free memory held by the tree below this (root) node: drop the previous
+        roots above it and every subtree with fewer than min_visits visits
+        (their actions become untried again). Return the nodes freed.
+        """
+        # children rebuild their actions from here once the parent is gone
+        self.my_actions
+        self.opp_actions
+        self.parent = None
+
+        freed = 0
+        stack: list[MCTSNode] = [self]
+        while stack:
+            node = stack.pop()
+            for action, child in list(node.__action_to_children.items()):
+                if node is not self and child.num_visits < min_visits:
+                    freed += child.tree_size()
+                    del node.__action_to_children[action]
+                    node.untried_actions.append(action)
+                    node.__untried_ranked = False
                 else:
-                    # recursively delete all other children
-                    child.chop_nodes_except()
-        else:
-            del self.__action_to_children
-            del self.board
-            del self.parent
-            del self.parent_action
-            del self.my_actions
-            del self.results
-            del self.color
-            del self.num_visits
-            del self.untried_actions
+                    stack.append(child)
+        return freed
+
+    def discard_actions(self, move_ids: set[int]):
+        """
+        Stop searching the given (proven losing) actions, unless that would
+        leave nothing to play
+        """
+        if all(action_id(action) in move_ids for action in self.my_actions):
+            return
+        self.untried_actions = [
+            action
+            for action in self.untried_actions
+            if action_id(action) not in move_ids
+        ]
+        for action, child in list(self.__action_to_children.items()):
+            if child.parent_id in move_ids:
+                del self.__action_to_children[action]
+
+    def set_frozen(self, frozen: bool):
+        self.options.expansion_frozen = frozen
 
     def get_child(self, action: Action):
         """
@@ -0,0 +1,205 @@
+import os
+from typing import Iterable, Iterator
+
+from .telemetry import debug
+
+# Keeps the search tree under the referee's space limit. The referee passes
+# space_remaining/space_limit (MB) to every action() call and enforces the
+# process' peak virtual memory (VmPeak). CPython keeps freed nodes' memory
+# for reuse instead of giving it back, so neither VmSize nor VmPeak drops
+# after a prune: the tree is budgeted on its node count * bytes per node
+# instead, on top of the memory the rest of the process held at the start
+# of the move. The measured peak, which only grows, just freezes the tree.
+
+PRUNE_FRACTION = 0.7  # prune low visit subtrees past this share of the limit
+PRUNE_HYSTERESIS = 0.05  # the next prune waits for this much growth
+FREEZE_FRACTION = 0.85  # stop growing the tree past this share of the limit
+PRUNE_VISITS = 2  # subtrees with fewer visits than this get pruned
+CHECK_INTERVAL = 25  # simulations between checks
+RELEASE_PER_TICK = 50  # discarded nodes freed per simulation
+
+
+def vm_peak() -> float | None:
+    """
+    Peak virtual memory size of the process in MB, None if unknown
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmPeak:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def vm_size() -> float | None:
+    """
+    Current virtual memory size of the process in MB, None if unknown
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.readline().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class Graveyard:
+    """
+    Subtrees discarded when the root advances, freed a few nodes at a time
+    during later searches instead of all at once on the critical path.
+    Nodes (MCTSNode or LeanNode) provide release(), which cuts the node's
+    links (so no reference cycles are left for the garbage collector) and
+    returns its children to release next.
+    """
+
+    def __init__(self):
+        self.pending: list[Iterator] = []  # batches of nodes, a stack
+        self.freed = 0
+
+    def bury(self, nodes: Iterable):
+        """
+        Queue nodes with their subtrees for freeing, O(1)
+        """
+        self.pending.append(iter(nodes))
+
+    def release(self, limit: int | None = None) -> int:
+        """
+        Free up to limit nodes (all without a limit), iteratively
+        Return the nodes freed
+        """
+        freed = 0
+        pending = self.pending
+        while pending and (limit is None or freed < limit):
+            node = next(pending[-1], None)
+            if node is None:
+                pending.pop()
+                continue
+            pending.append(iter(node.release()))
+            freed += 1
+        self.freed += freed
+        return freed
+
+
+class MemoryGovernor:
+    """
+    Watches memory during a search, pruning and freezing the tree near the
+    limit. The tree is either an MCTSNode root or a LeanSearch, both provide
+    NODE_BYTES, nodes_created, tree_size(), prune(min_visits) and
+    set_frozen(frozen).
+    """
+
+    def __init__(
+        self,
+        prune_fraction: float = PRUNE_FRACTION,
+        freeze_fraction: float = FREEZE_FRACTION,
+        space_limit: float | None = None,
+    ):
+        self.prune_fraction = prune_fraction
+        self.freeze_fraction = freeze_fraction
+        self.default_limit = space_limit
+        self.limit: float | None = space_limit
+        self.base: float = 0  # MB held by everything but the tree
+        self.peak_offset: float | None = None  # VmPeak minus referee's usage
+        self.nodes = 0  # tree size, kept up to date without walking it
+        self.created_at_start = 0
+        self.prune_at = prune_fraction
+        self.ticks = 0
+        self.peak_fraction = 0.0
+        self.graveyard = Graveyard()
+
+        # activity, reported after every move
+        self.prunes = 0
+        self.nodes_pruned = 0
+        self.frozen = False
+
+    def start_move(self, referee: dict, tree):
+        """
+        Take the referee's view of our memory use as the baseline for a move
+        """
+        self.limit = referee.get("space_limit") or self.default_limit
+        self.nodes = tree.tree_size()
+        self.created_at_start = tree.nodes_created
+        remaining = referee.get("space_remaining")
+        self.base = 0
+        self.peak_offset = None
+        if self.limit is not None and remaining is not None:
+            used = self.limit - remaining
+            self.base = max(0.0, used - self.nodes * tree.NODE_BYTES / 2**20)
+            size = vm_size()
+            if size is not None:
+                self.peak_offset = size - used
+        self.prune_at = self.prune_fraction
+        self.ticks = 0
+        self.prunes = 0
+        self.nodes_pruned = 0
+        self.peak_fraction = 0.0
+        self.frozen = False
+        tree.set_frozen(False)
+
+    def used(self, tree) -> float:
+        """
+        Estimated memory use in MB: the rest of the process plus the nodes
+        the tree holds now
+        """
+        nodes = self.nodes + tree.nodes_created - self.created_at_start
+        return self.base + nodes * tree.NODE_BYTES / 2**20
+
+    def peak_used(self) -> float | None:
+        """
+        The referee's measure: peak memory use in MB, None if unknown
+        """
+        peak = vm_peak()
+        if peak is None or self.peak_offset is None:
+            return None
+        return peak - self.peak_offset
+
+    def tick(self, tree):
+        """
+        Called once per simulation, frees some discarded nodes and checks
+        memory every CHECK_INTERVAL
+        """
+        self.ticks += 1
+        if self.graveyard.pending:
+            self.graveyard.release(RELEASE_PER_TICK)
+        if self.limit is None or self.ticks % CHECK_INTERVAL:
+            return
+        fraction = self.used(tree) / self.limit
+        peak = self.peak_used()
+        peak_fraction = fraction if peak is None else max(fraction, peak / self.limit)
+        self.peak_fraction = max(self.peak_fraction, peak_fraction)
+        if fraction >= self.prune_at:
+            # discarded subtrees go first, all at once
+            self.graveyard.release()
+            freed = tree.prune(PRUNE_VISITS)
+            self.prunes += 1
+            self.nodes_pruned += freed
+            self.nodes -= freed
+            # no new prune (a full tree walk) before the tree grows again
+            self.prune_at = max(
+                self.prune_fraction, self.used(tree) / self.limit + PRUNE_HYSTERESIS
+            )
+        if peak_fraction >= self.freeze_fraction and not self.frozen:
+            self.frozen = True
+            tree.set_frozen(True)
+
+    def stats(self) -> dict:
+        """
+        Telemetry fields of this move's activity
+        """
+        return {
+            "memory_peak": self.peak_fraction if self.limit is not None else None,
+            "prunes": self.prunes,
+            "nodes_pruned": self.nodes_pruned,
+            "frozen": self.frozen,
+        }
+
+    def report(self):
+        if self.limit is None:
+            return
+        debug(
+            f"memory: peak {self.peak_fraction:.0%} of {self.limit}MB, "
+            f"{self.prunes} prunes freed {self.nodes_pruned} nodes, "
+            f"{'frozen' if self.frozen else 'growing'}"
+        )
@@ -0,0 +1,280 @@
+import os
+import random
+from math import log
+from multiprocessing import get_context, shared_memory
+
+from .deadline import Deadline
+from .mcts import MCTSNode
+from .telemetry import debug
+from .helpers.placements import action_id, id_action
+from .helpers.sim_board import SimBoard
+from referee.game.actions import Action
+from referee.game.player import PlayerColor
+
+# Tree-parallel MCTS: the node arrays live in shared memory and every worker
+# process runs the select/expand/rollout/backprop cycle on the same tree.
+# Children of a node are allocated as one contiguous block, so a node only
+# needs (first_child, num_children) to find them.
+# The referee charges time.process_time of the agent's own process, which
+# does not include the workers: this mode goes around its CPU accounting.
+# To keep the total CPU within the move's budget anyway, every worker gets
+# an equal share of it on its own CPU clock.
+
+DEFAULT_CAPACITY = 500_000
+NUM_STRIPES = 64
+VIRTUAL_LOSS = 3
+C_PARAM = 1.4
+
+# node states
+UNEXPANDED = 0
+EXPANDING = 1
+EXPANDED = 2
+TERMINAL = 3
+
+# header slots
+_NEXT_FREE = 0
+_SIM_COUNT = 1
+
+# (name, memoryview typecode), widest first to keep every array aligned
+_FIELDS = (
+    ("wins", "d"),
+    ("visits", "i"),
+    ("virtual", "i"),
+    ("first_child", "i"),
+    ("num_children", "i"),
+    ("move", "h"),
+    ("state", "b"),
+)
+_ITEM_SIZE = {"q": 8, "d": 8, "i": 4, "h": 2, "b": 1}
+_HEADER_SLOTS = 2
+
+
+class SharedTree:
+    """
+    Fixed capacity node arrays backed by a single shared memory block
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        size = _HEADER_SLOTS * _ITEM_SIZE["q"] + sum(
+            capacity * _ITEM_SIZE[code] for _, code in _FIELDS
+        )
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self._views = []
+
+        offset = 0
+        self.header = self._view(offset, _HEADER_SLOTS, "q")
+        offset += _HEADER_SLOTS * _ITEM_SIZE["q"]
+        for name, code in _FIELDS:
+            setattr(self, name, self._view(offset, capacity, code))
+            offset += capacity * _ITEM_SIZE[code]
+
+        # node 0 is the root, shared memory starts zeroed
+        self.header[_NEXT_FREE] = 1
+        self.move[0] = -1
+
+    def _view(self, offset: int, length: int, code: str) -> memoryview:
+        raw = self.shm.buf[offset : offset + length * _ITEM_SIZE[code]]
+        view = raw.cast(code)
+        # both views hold the buffer, so both must be released before closing
+        self._views.extend((view, raw))
+        return view
+
+    def children(self, node: int) -> range:
+        first = self.first_child[node]
+        return range(first, first + self.num_children[node])
+
+    def release(self):
+        """
+        Release the views and free the shared memory block
+        """
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _mover(root_color: PlayerColor, depth: int) -> PlayerColor:
+    """
+    Colour of the player whose move leads into a node at the given depth
+    """
+    return root_color if depth % 2 == 1 else root_color.opponent
+
+
+def _select(tree: SharedTree, node: int) -> int:
+    """
+    UCB1 over the children of a node, counting virtual losses as visits
+    """
+    parent_visits = tree.visits[node] + tree.virtual[node] + 1
+    log_visits = log(parent_visits)
+    best_score = float("-inf")
+    best = -1
+    children = tree.children(node)
+    # start at a random child so untried children are spread over workers
+    start = random.randrange(len(children))
+    for i in range(len(children)):
+        child = children[(start + i) % len(children)]
+        visits = tree.visits[child] + tree.virtual[child]
+        if visits == 0:
+            return child
+        score = tree.wins[child] / visits + C_PARAM * (log_visits / visits) ** 0.5
+        if score > best_score:
+            best_score = score
+            best = child
+    return best
+
+
+def _expand(tree: SharedTree, node: int, leaf: MCTSNode, header_lock) -> bool:
+    """
+    Allocate the children of a node, return False if the tree is full
+    """
+    actions = leaf.my_actions
+    with header_lock:
+        first = tree.header[_NEXT_FREE]
+        if first + len(actions) > tree.capacity:
+            return False
+        tree.header[_NEXT_FREE] = first + len(actions)
+    for i, action in enumerate(actions):
+        tree.move[first + i] = action_id(action)
+    tree.first_child[node] = first
+    tree.num_children[node] = len(actions)
+    # publish the children last, readers only trust EXPANDED nodes
+    tree.state[node] = EXPANDED
+    return True
+
+
+def _worker(
+    tree: SharedTree,
+    root_board: SimBoard,
+    stripes: list,
+    header_lock,
+    budget: float,
+    sim_no: int,
+    steps: int,
+    seed: int,
+):
+    """
+    Worker process loop: repeat MCTS iterations on the shared tree until
+    its CPU time budget runs out
+    """
+    random.seed(seed)
+    root_color = root_board.turn_color
+    # not armed: a worker's process_time only counts the worker itself, and
+    # polling it once per iteration is cheap next to a rollout
+    deadline = Deadline(budget)
+    while not deadline.expired():
+        with header_lock:
+            if tree.header[_SIM_COUNT] >= sim_no:
+                break
+            tree.header[_SIM_COUNT] += 1
+
+        # selection, spreading workers out with virtual loss
+        board = root_board.copy()
+        node = 0
+        path = [0]
+        while tree.state[node] == EXPANDED:
+            node = _select(tree, node)
+            with stripes[node % NUM_STRIPES]:
+                tree.virtual[node] += VIRTUAL_LOSS
+            board.apply_action(id_action(tree.move[node]))
+            path.append(node)
+
+        # expansion + rollout
+        winner: PlayerColor | None = None
+        if tree.state[node] == TERMINAL or board.game_over:
+            tree.state[node] = TERMINAL
+            winner = board.winner_color
+        else:
+            with stripes[node % NUM_STRIPES]:
+                claimed = tree.state[node] == UNEXPANDED
+                if claimed:
+                    tree.state[node] = EXPANDING
+            leaf = MCTSNode(board)
+            if claimed and not _expand(tree, node, leaf, header_lock):
+                tree.state[node] = UNEXPANDED
+            winner, _ = leaf.new_rollout(steps)
+
+        # backpropagation
+        for depth, visited in enumerate(path):
+            mover = _mover(root_color, depth)
+            reward = 0.5 if winner is None else float(winner == mover)
+            with stripes[visited % NUM_STRIPES]:
+                tree.visits[visited] += 1
+                tree.wins[visited] += reward
+                if depth > 0:
+                    tree.virtual[visited] -= VIRTUAL_LOSS
+
+
+def _children_cpu() -> float:
+    """
+    CPU seconds used by the finished worker processes so far
+    """
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def parallel_best_action(
+    board: SimBoard,
+    workers: int,
+    steps: int,
+    sim_no: int,
+    time_limit: float,
+    capacity: int = DEFAULT_CAPACITY,
+) -> Action | None:
+    """
+    Run a tree-parallel MCTS search from the given board with several
+    worker processes, sharing time_limit CPU seconds between them
+    Return the most visited root action
+    """
+    ctx = get_context("fork")
+    tree = SharedTree(capacity)
+    processes = []
+    try:
+        stripes = [ctx.Lock() for _ in range(NUM_STRIPES)]
+        header_lock = ctx.Lock()
+        cpu_before = _children_cpu()
+
+        processes = [
+            ctx.Process(
+                target=_worker,
+                args=(
+                    tree,
+                    board,
+                    stripes,
+                    header_lock,
+                    time_limit / workers,
+                    sim_no,
+                    steps,
+                    random.getrandbits(32),
+                ),
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        cpu = _children_cpu() - cpu_before
+        sim_count = tree.header[_SIM_COUNT]
+        debug("parallel sim_count: ", sim_count, "workers: ", workers)
+        if sim_count > 0 and cpu > 0:
+            debug("simulations per CPU second: ", sim_count / cpu)
+        debug("tree nodes: ", tree.header[_NEXT_FREE])
+
+        action = None
+        if tree.state[0] == EXPANDED:
+            best = max(tree.children(0), key=lambda child: tree.visits[child])
+            action = id_action(tree.move[best])
+            debug("best action: ", action)
+        else:
+            print("ERROR: root was never expanded")
+        return action
+    finally:
+        # the shared segment counts against the space limit, never leak it
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        tree.release()
@@ -0,0 +1,101 @@
+import random
+from typing import Callable
+
+from .deadline import Deadline
+from .evaluation import MAX_EXTENSION, MIN_CUTOFF_STEPS, is_decisive, is_volatile
+from .helpers.fast_board import FastBoard
+from .helpers.placements import (
+    FULL_MASK,
+    PLACEMENT_LINES,
+    PLACEMENT_MASKS,
+    PLACEMENT_NEIGHBOURS,
+    frontier,
+)
+
+# Playout policies: pick the next move for the player to move on a FastBoard.
+# "random" is uniform over the legal moves. "heavy" draws a few legal moves
+# and picks one by roulette, weighted by cheap tactical features, so that it
+# costs at most about twice a random move.
+
+HEAVY_SAMPLE = 8  # legal moves weighed per heavy move
+# weights for: lines completed, opponent tokens cleared,
+# frontier gained, opponent frontier blocked
+HEAVY_WEIGHTS = (3.0, 0.5, 1.0, 1.0)
+
+
+def random_policy(board: FastBoard) -> int:
+    return board.random_move()
+
+
+def heavy_policy(board: FastBoard) -> int:
+    """
+    Roulette over a sample of the legal moves, by tactical features
+    """
+    moves = board.legal_moves()
+    if len(moves) > HEAVY_SAMPLE:
+        moves = random.sample(moves, HEAVY_SAMPLE)
+    color = board.turn_color
+    own = board.tokens[color]
+    opp = board.tokens[color.opponent]
+    occupied = own | opp
+    empty = FULL_MASK & ~occupied
+    own_frontier = frontier(own, empty)
+    opp_frontier = frontier(opp, empty)
+    w_lines, w_cleared, w_gained, w_blocked = HEAVY_WEIGHTS
+
+    weights = []
+    for move_id in moves:
+        mask = PLACEMENT_MASKS[move_id]
+        filled = occupied | mask
+        lines = 0
+        cleared = 0
+        for line in PLACEMENT_LINES[move_id]:
+            if filled & line == line:
+                lines += 1
+                cleared |= line
+        gained = PLACEMENT_NEIGHBOURS[move_id] & empty & ~mask & ~own_frontier
+        weights.append(
+            1.0
+            + w_lines * lines
+            + w_cleared * (opp & cleared).bit_count()
+            + w_gained * gained.bit_count()
+            + w_blocked * (mask & opp_frontier).bit_count()
+        )
+    return random.choices(moves, weights)[0]
+
+
+POLICIES: dict[str, Callable[[FastBoard], int]] = {
+    "random": random_policy,
+    "heavy": heavy_policy,
+}
+
+
+def playout(
+    board: FastBoard,
+    policy: Callable[[FastBoard], int],
+    max_steps: int,
+    deadline: Deadline | None = None,
+    adaptive: bool = False,
+) -> list[int]:
+    """
+    Play policy moves on the board until the game ends or max_steps
+    Adaptive playouts stop early on a decisive position and run up to
+    MAX_EXTENSION steps past max_steps while the last move has just
+    cleared a line (the position is still settling)
+    Return the moves played (left on the board for the caller to undo)
+    """
+    moves = []
+    while not board.game_over:
+        steps = len(moves)
+        if steps >= max_steps and not (
+            adaptive and steps < max_steps + MAX_EXTENSION and is_volatile(board)
+        ):
+            break
+        if adaptive and steps >= MIN_CUTOFF_STEPS and is_decisive(board):
+            break
+        if deadline:
+            deadline.check()
+        move = policy(board)
+        board.apply(move)
+        moves.append(move)
+    return moves
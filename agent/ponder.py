@@ -0,0 +1,77 @@
+import threading
+import time
+from timeit import default_timer as timer
+from typing import Callable
+
+from .telemetry import debug
+
+# Pondering: keep searching in a background thread while the opponent thinks.
+# The referee only charges CPU time used inside action()/update() calls, so
+# ponder time is tracked separately (thread CPU time), along with how long
+# each pause blocked the call that requested it.
+
+
+class Ponderer:
+    """
+    Runs search steps in a background thread until paused
+    """
+
+    def __init__(self):
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+        # session (since the last start) and total statistics
+        self.sims = 0
+        self.cpu_time = 0.0
+        self.total_sims = 0
+        self.total_cpu_time = 0.0
+        self.pause_latency = 0.0  # wall time spent waiting for the last pause
+        self.total_pause_latency = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, step: Callable[[], None]):
+        """
+        Start calling step() repeatedly in the background
+        """
+        self.pause()
+        self._stop.clear()
+        self.sims = 0
+        self.cpu_time = 0.0
+        self._thread = threading.Thread(target=self._run, args=(step,), daemon=True)
+        self._thread.start()
+
+    def _run(self, step: Callable[[], None]):
+        start = time.thread_time()
+        while not self._stop.is_set():
+            step()
+            self.sims += 1
+        self.cpu_time = time.thread_time() - start
+
+    def pause(self) -> bool:
+        """
+        Stop the background search after its current step, return True if it
+        was running. Must be called before touching the searched tree.
+        """
+        if self._thread is None:
+            return False
+        start = timer()
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.pause_latency = timer() - start
+
+        self.total_sims += self.sims
+        self.total_cpu_time += self.cpu_time
+        self.total_pause_latency += self.pause_latency
+        return True
+
+    def report(self):
+        debug(
+            f"pondered {self.sims} sims in {self.cpu_time:.3f}s cpu, "
+            f"paused in {self.pause_latency * 1000:.1f}ms "
+            f"(total {self.total_sims} sims, {self.total_cpu_time:.3f}s cpu, "
+            f"{self.total_pause_latency:.3f}s pausing)"
+        )
@@ -0,0 +1,76 @@
+from .endgame import ENDGAME_MOBILITY, mobility
+from .horizon import HORIZON_PLIES
+from .telemetry import debug
+from .helpers.fast_board import FastBoard
+from referee.game.constants import MAX_TURNS
+
+# Picks the engines to ask for each move, in order, from the game phase, the
+# measured branching factor and the time left. An engine may pass (return no
+# move), then the next one is asked; MCTS always answers. The engines
+# themselves live on the agent for the whole game, so their tables, trees
+# and book mapping stay warm from move to move.
+
+BOOK = "book"
+HORIZON = "horizon"
+ENDGAME = "endgame"
+MCTS = "mcts"
+
+BOOK_PLIES = 6  # look moves up in the opening book before this turn
+MIN_SOLVER_TIME = 5.0  # CPU seconds left below which the solver is not tried
+
+
+class Portfolio:
+    """
+    Per-move engine choice, with a log of which engine answered
+    """
+
+    def __init__(self, engines: set[str]):
+        self.engines = engines | {MCTS}
+        # engine -> [moves answered, moves passed, CPU seconds]
+        self.stats: dict[str, list[float]] = {
+            engine: [0, 0, 0.0] for engine in self.engines
+        }
+
+    def plan(
+        self, board: FastBoard, num_moves: int, time_remaining: float | None
+    ) -> list[str]:
+        """
+        Engines to ask for this move, in order
+        """
+        plan = []
+        if BOOK in self.engines and board.turn_count < BOOK_PLIES:
+            plan.append(BOOK)
+        # the solver may give up after its whole time slice, the horizon
+        # search is anytime
+        exact = time_remaining is None or time_remaining >= MIN_SOLVER_TIME
+        if HORIZON in self.engines and MAX_TURNS - board.turn_count <= HORIZON_PLIES:
+            plan.append(HORIZON)
+        elif (
+            exact
+            and ENDGAME in self.engines
+            and board.turn_count >= 2
+            # own moves first, the opponent's only if they could still fit
+            and num_moves <= ENDGAME_MOBILITY
+            and mobility(board) <= ENDGAME_MOBILITY
+        ):
+            plan.append(ENDGAME)
+        plan.append(MCTS)
+        return plan
+
+    def record(self, engine: str, elapsed: float, answered: bool):
+        stats = self.stats[engine]
+        stats[0 if answered else 1] += 1
+        stats[2] += elapsed
+        debug(
+            f"engine {engine}: {'answered' if answered else 'passed'} "
+            f"in {elapsed:.3f}s"
+        )
+
+    def report(self):
+        debug(
+            "engines: "
+            + ", ".join(
+                f"{engine} {answered:.0f}/{answered + passed:.0f} {seconds:.1f}s"
+                for engine, (answered, passed, seconds) in self.stats.items()
+            )
+        )
@@ -2,21 +2,79 @@
 # Project Part B: Game Playing self
 
 import random
+from time import process_time
+from typing import TYPE_CHECKING
 
-from .mcts import MCTSNode
+from .book import OpeningBook
+from .endgame import DRAW, MAX_SOLVE_TIME, SOLVER_SHARE, WIN, EndgameSolver
+from .horizon import HorizonSearch
+from .mcts import MCTSNode, SearchOptions
+from .lean_mcts import LeanSearch
+from .memory import MemoryGovernor
+from .ponder import Ponderer
+from .telemetry import Telemetry, debug
+from .time_manager import TimeManager
+from .parallel_mcts import parallel_best_action
+from .portfolio import BOOK, ENDGAME, HORIZON, MCTS, Portfolio
+from .helpers.fast_board import FastBoard
 from .helpers.movements import generate_random_move
+from .helpers.placements import id_action
+from .helpers.priors import PriorContext
 from .helpers.sim_board import SimBoard
-from timeit import default_timer as timer
 from referee.game import PlayerColor, Action, Action
-from referee.game.constants import MAX_TURNS
+
+if TYPE_CHECKING:
+    from .batch_eval import BatchEvaluator
 
 WIDE_DEPTH = 4
 NARROW_DEPTH = 8
 DEFAULT_SIM_NO = 200
 NARROW_MOVE_STANDARD = 100
-BACKUP_TIME = 5
-NUM_TURN_ESTIMATION_ROLLOUTS = 3
 UNLIM_TIME = 10000
+# worker processes sharing one tree, 0 to search in this process only; the
+# referee does not see the workers' CPU time (each gets a share of the move
+# budget so the total stays within it)
+PARALLEL_WORKERS = 0
+# blend all-moves-as-first statistics into selection
+USE_RAVE = False
+# open up children best-prior first as visits grow, instead of giving up
+# on search (random moves) when there are too many actions
+USE_WIDENING = True
+# PUCT selection: exploration weighted by softmax prior probabilities of the
+# moves (replaces UCB1 and widening)
+USE_PUCT = False
+# sequential halving over prior-picked root candidates instead of UCB at the
+# root, better at finding the best move with few simulations
+USE_HALVING = False
+# nodes keep only their move, one working board is applied/undone along the
+# search path (much smaller trees, plain UCT only)
+USE_LEAN_TREE = False
+# play opening moves from agent/opening_book.bin (built offline by
+# testing/build_book.py) when the position is in it
+USE_BOOK = True
+# try to prove the game result with alpha-beta once both sides are short of
+# moves, play proven wins and never search moves proven to lose
+USE_ENDGAME_SOLVER = True
+# in the last plies before the turn limit, play the move of an alpha-beta
+# search on the token difference at the limit instead of MCTS
+USE_HORIZON_SEARCH = True
+# keep searching the opponent's replies in a background thread between calls
+PONDER = False
+# evaluate MCTS leaves in NumPy batches of this size instead of rolling them
+# out, 0 to use rollouts
+BATCH_EVAL_SIZE = 0
+BATCH_EVAL_WAIT = 0.05  # CPU seconds a queued leaf may wait for its batch
+# with BATCH_EVAL_SIZE, value batched leaves by vectorised playouts of
+# NARROW_DEPTH moves (agent/batch_rollout.py) instead of the heuristic model
+BATCH_ROLLOUTS = False
+# evaluate leaves with the learned value network instead of rollouts, in
+# batches of BATCH_EVAL_SIZE (at least 1); needs agent/value_weights.npz from
+# testing/train_value.py, which only saves a net that beats the heuristic
+# (none has so far), and falls back to the heuristic model without it
+USE_VALUE_NET = False
+# append one JSON record of search statistics per move to this file
+# (agent/telemetry.py), None to turn telemetry off
+TELEMETRY_PATH = None
 
 
 class Agent:
@@ -24,10 +82,24 @@ class Agent:
     # attributes
     board: SimBoard  # state of game
     root: MCTSNode | None  # root node of MCTS tree
+    lean: LeanSearch | None  # board-free tree, used instead of root
+    options: SearchOptions  # settings for the MCTS tree
+    governor: MemoryGovernor  # keeps the tree under the space limit
+    ponderer: Ponderer  # searches while the opponent thinks
+    book: OpeningBook | None  # precomputed opening replies
+    solver: EndgameSolver | None  # exact endgame search
+    horizon: HorizonSearch | None  # token count search near the turn limit
+    portfolio: Portfolio  # picks the engines to ask for each move
+    clock: TimeManager  # CPU time budget per move
+    telemetry: Telemetry  # per-move search statistics
+    evaluator: "BatchEvaluator | None"  # batched leaf evaluation
     color: PlayerColor  # agent colour
     opponent: PlayerColor  # agent opponent
     estimated_time: float  # estimated time for each move
     estimated_turns: int  # estimated turns for each move
+    num_moves: int  # legal moves this turn
+    timed: bool | None  # time budget set for this move (None: not yet)
+    move_budget: float | None  # CPU seconds allocated to this move
 
     def __init__(self, color: PlayerColor, **referee: dict):
         self.init(color)
@@ -44,87 +116,368 @@ class Agent:
         # game state
         self.board = SimBoard()
         self.root = None
+        self.lean = None
+        self.governor = MemoryGovernor()
+        self.ponderer = Ponderer()
+        self.book = OpeningBook() if USE_BOOK else None
+        self.solver = EndgameSolver() if USE_ENDGAME_SOLVER else None
+        self.horizon = HorizonSearch() if USE_HORIZON_SEARCH else None
+        engines = {BOOK: self.book, ENDGAME: self.solver, HORIZON: self.horizon}
+        self.portfolio = Portfolio({name for name, on in engines.items() if on})
+        self.clock = TimeManager()
+        self.telemetry = Telemetry(TELEMETRY_PATH)
+        self.evaluator = None
+        if BATCH_EVAL_SIZE or USE_VALUE_NET:
+            # imported here so that NumPy stays optional
+            from .batch_eval import BatchEvaluator, RolloutModel, heuristic_model
+            from .value_net import ValueNet
+
+            if USE_VALUE_NET:
+                model = ValueNet.load()
+                if model is None:
+                    print("WARNING: no value net weights, using the heuristic")
+                    model = heuristic_model
+            elif BATCH_ROLLOUTS:
+                model = RolloutModel(NARROW_DEPTH)
+            else:
+                model = heuristic_model
+            self.evaluator = BatchEvaluator(
+                max(1, BATCH_EVAL_SIZE), BATCH_EVAL_WAIT, model
+            )
+        self.options = SearchOptions(
+            rave=USE_RAVE, widening=USE_WIDENING, halving=USE_HALVING, puct=USE_PUCT
+        )
 
         # announce agent
         print(f"{self.name} *initiated*: {self.color}")
 
     def action(self, **referee: dict) -> Action:
         """
-        Generate an action for the agent
+        Generate an action for the agent, asking the engines the portfolio
+        picks for this move in turn
+        """
+        if self.ponderer.pause():
+            self.ponderer.report()
+
+        move_start = process_time()
+        board = FastBoard.from_sim_board(self.board)
+        self.num_moves = len(board.legal_moves())
+        self.timed = None
+        self.move_budget = None
+        if self.solver:
+            # proofs are about the previous position
+            self.solver.refuted = set()
+        engines = {
+            BOOK: self.book_action,
+            HORIZON: self.horizon_action,
+            ENDGAME: self.endgame_action,
+            MCTS: self.search_action,
+        }
+        time_remaining: float | None = referee.get("time_remaining")  # type: ignore
+        for engine in self.portfolio.plan(board, self.num_moves, time_remaining):
+            start = process_time()
+            action = engines[engine](referee)
+            elapsed = process_time() - start
+            self.portfolio.record(engine, elapsed, action is not None)
+            if action is not None:
+                self.portfolio.report()
+                if self.telemetry.enabled:
+                    self.record_move(engine, action, process_time() - move_start)
+                return action
+        return self.fallback_move()
+
+    def record_move(self, engine: str, action: Action, used: float):
+        """
+        Write this move's telemetry record, with the statistics of the
+        engine that answered
+        """
+        stats = {}
+        tree = self.lean or self.root
+        if engine == MCTS and tree and tree.sim_count:
+            stats = (
+                tree.search_stats(action) | self.governor.stats() | self.clock.stats()
+            )
+        elif engine == ENDGAME and self.solver:
+            stats = {"table_hit_rate": self.solver.table.hit_rate()}
+        elif engine == HORIZON and self.horizon:
+            stats = {"table_hit_rate": self.horizon.table.hit_rate()}
+        self.telemetry.record(
+            agent=self.name,
+            color=self.color.name,
+            turn=self.board.turn_count,
+            engine=engine,
+            legal_moves=self.num_moves,
+            budget=self.move_budget,
+            used=used,
+            move=str(action),
+            **stats,
+        )
+
+    def start_clock(self, referee: dict) -> bool:
+        """
+        Set this move's time budget once, for whichever engine needs it first
+        Return False if there is no time left to search
+        """
+        if self.timed is None:
+            if self.lean:
+                root_values = self.lean.child_values()
+            elif self.root:
+                root_values = self.root.child_values()
+            else:
+                root_values = []
+            self.timed = self.set_timer(referee, self.num_moves, root_values)
+            self.move_budget = self.estimated_time if self.timed else 0.0
+        return self.timed
+
+    def book_action(self, referee: dict) -> Action | None:
+        move_id = self.book_move()
+        return None if move_id is None else id_action(move_id)
+
+    def horizon_action(self, referee: dict) -> Action | None:
+        if not self.start_clock(referee):
+            return None
+        move_id = self.horizon_move()
+        return None if move_id is None else id_action(move_id)
+
+    def endgame_action(self, referee: dict) -> Action | None:
+        if not self.start_clock(referee):
+            return None
+        move_id = self.endgame_move()
+        return None if move_id is None else id_action(move_id)
+
+    def search_action(self, referee: dict) -> Action:
+        """
+        MCTS move, always answers
         """
-        # first two turns, do random moves
+        # first two turns (out of book), do random moves
         if self.board.turn_count < 2:
             return generate_random_move(self.board.state, self.color, first_turns=True)
 
+        if USE_LEAN_TREE:
+            return self.lean_action(referee)
+
         # then can start MCTS
         if not self.root:
-            self.root = MCTSNode(self.board.copy())
+            self.root = MCTSNode(self.board.copy(), options=self.options)
 
         # branching factor too high, pick random since not worth MCTS
-        if self.root.estimated_time < 0 or (
-            len(self.root.my_actions) > 200 and self.board.turn_count < 6
+        # (unless widening keeps the search narrow)
+        if (
+            not self.options.widening
+            and len(self.root.my_actions) > 200
+            and self.board.turn_count < 6
         ):
             return self.random_move()
 
-        # be aware of timer
-        if referee:
-            self.set_timer(referee)
-        else:
-            # if no referee, just set a large default time
-            self.estimated_time = UNLIM_TIME
+        # be aware of timer (earlier engines may have used it all up)
+        if not self.start_clock(referee) or self.estimated_time <= 0:
+            return self.fallback_move()
+        if self.solver and self.solver.refuted:
+            self.root.discard_actions(self.solver.refuted)
         self.root.estimated_time = self.estimated_time
 
+        if PARALLEL_WORKERS > 0:
+            return self.parallel_action()
+
+        self.governor.start_move(referee, self.root)
         # casual search if not too many moves
         if len(self.root.my_actions) > NARROW_MOVE_STANDARD:
-            print("Wide search")
+            debug("Wide search")
             action = self.root.best_action(
-                WIDE_DEPTH, min((int)(len(self.root.my_actions)), DEFAULT_SIM_NO)
+                WIDE_DEPTH,
+                min((int)(len(self.root.my_actions)), DEFAULT_SIM_NO),
+                self.governor,
+                self.evaluator,
             )
         else:
             # take it serious on intensive situations
-            print("Narrow search")
+            debug("Narrow search")
             action = self.root.best_action(
                 NARROW_DEPTH,
                 max((int)(len(self.root.my_actions) * 2), DEFAULT_SIM_NO),
+                self.governor,
+                self.evaluator,
             )
+        self.governor.report()
+        if self.evaluator:
+            self.evaluator.report()
+        self.clock.finish(self.root.stopped_early)
+        self.clock.report()
 
         if action:
             self.root.my_actions.remove(action)
             return action
-        return self.random_move()
+        return self.fallback_move()
+
+    def parallel_action(self) -> Action:
+        """
+        Search with several processes descending one shared tree
+        """
+        debug("Parallel search")
+        if len(self.root.my_actions) > NARROW_MOVE_STANDARD:  # type: ignore
+            steps, sim_no = WIDE_DEPTH, DEFAULT_SIM_NO
+        else:
+            steps, sim_no = NARROW_DEPTH, len(self.root.my_actions) * 2  # type: ignore
+        action = parallel_best_action(
+            self.board,
+            PARALLEL_WORKERS,
+            steps - 1,
+            max(sim_no, DEFAULT_SIM_NO) * PARALLEL_WORKERS,
+            self.estimated_time,
+        )
+        if action:
+            return action
+        return self.fallback_move()
+
+    def lean_action(self, referee: dict) -> Action:
+        """
+        Search with board-free nodes and a single working board
+        """
+        if not self.lean:
+            self.lean = LeanSearch(
+                FastBoard.from_sim_board(self.board),
+                playout=self.options.playout,
+                adaptive_cutoff=self.options.adaptive_cutoff,
+                evaluation=self.options.evaluation,
+            )
+        num_moves = self.num_moves
+        if not self.start_clock(referee) or self.estimated_time <= 0:
+            return self.fallback_move()
+        self.lean.estimated_time = self.estimated_time
+        self.governor.start_move(referee, self.lean)
+
+        if num_moves > NARROW_MOVE_STANDARD:
+            debug("Wide search")
+            action = self.lean.best_action(
+                WIDE_DEPTH, min(num_moves, DEFAULT_SIM_NO), self.governor
+            )
+        else:
+            debug("Narrow search")
+            action = self.lean.best_action(
+                NARROW_DEPTH, max(num_moves * 2, DEFAULT_SIM_NO), self.governor
+            )
+        self.governor.report()
+        self.clock.finish(self.lean.stopped_early)
+        self.clock.report()
+        if action:
+            return action
+        return self.fallback_move()
 
     def update(self, color: PlayerColor, action: Action, **referee: dict):
         """
         Update the agent with the action resolved by the referee
         """
+        if self.ponderer.pause():
+            self.ponderer.report()
+
         self.board.apply_action(action)
-        if not self.root:
+        self.advance_tree(action)
+
+        # opponent to move: think about their replies meanwhile
+        if PONDER and self.board.turn_color != self.color:
+            self.start_pondering()
+
+    def advance_tree(self, action: Action):
+        """
+        Move the search tree's root past the action, keeping the subtree
+        below it (telemetry's reused_visits tells how much is kept)
+        """
+        if self.lean:
+            self.lean.advance(action, self.governor.graveyard)
+        elif self.root:
+            self.root = self.root.advance(action, self.governor.graveyard)
+
+    def start_pondering(self):
+        """
+        Search the current tree in the background until the next call
+        """
+        tree = self.lean or self.root
+        if not tree:
             return
-        new_root = self.root.get_child(action)
-        self.root.chop_nodes_except(new_root)
-        self.root = new_root
-
-    def set_timer(self, referee):
-        """
-        Set the timer for the agent to make a move
-        """
-        start_time = timer()
-        time_remaining: float = referee["time_remaining"]  # type: ignore
-        if time_remaining == None:
-            time_remaining = UNLIM_TIME
-        self.estimated_turns = self.root.estimate_turns(NUM_TURN_ESTIMATION_ROLLOUTS)  # type: ignore
-
-        if self.estimated_turns == 0:
-            self.estimated_turns = MAX_TURNS - self.board.turn_count
-            
-        estimation_cost = timer() - start_time
-        self.estimated_time = (
-            time_remaining - estimation_cost - BACKUP_TIME
-        ) / self.estimated_turns
-        time_left = time_remaining - estimation_cost
-
-        print("Time left: ", time_left)
-        print(f"Estimated time: {self.estimated_time} for {self.estimated_turns} moves")
+        if self.lean:
+            num_moves = len(self.lean.root_moves())
+        else:
+            num_moves = len(self.root.my_actions)  # type: ignore
+        steps = WIDE_DEPTH if num_moves > NARROW_MOVE_STANDARD else NARROW_DEPTH
+        governor = self.governor
+
+        def step():
+            tree.simulate(steps)
+            governor.tick(tree)
+
+        self.ponderer.start(step)
+
+    def set_timer(
+        self, referee: dict, num_moves: int, root_values: list[float]
+    ) -> bool:
+        """
+        Set the CPU time budget for this move
+        Return False if there is no time left to search
+        """
+        time_remaining: float | None = referee.get("time_remaining")  # type: ignore
+        if time_remaining is None:
+            # if no referee, just set a large default time
+            self.estimated_time = UNLIM_TIME
+            return True
+        self.estimated_time = self.clock.allocate(
+            time_remaining, self.board.turn_count, num_moves, root_values
+        )
+        self.estimated_turns = self.clock.expected_moves
+
+        debug("Time left: ", time_remaining)
+        debug(f"Estimated time: {self.estimated_time} for {self.estimated_turns} moves")
+        return not self.clock.panic(time_remaining) and self.estimated_time > 0
+
+    def book_move(self) -> int | None:
+        """
+        Opening book reply to the current position, if any
+        """
+        if not self.book:
+            return None
+        move_id = self.book.lookup(FastBoard.from_sim_board(self.board))
+        if move_id is not None:
+            debug(f"book move ({self.book.hits} so far)")
+        return move_id
+
+    def horizon_move(self) -> int | None:
+        """
+        Best move on the token count at the turn limit, once it is close
+        """
+        if not self.horizon:
+            return None
+        board = FastBoard.from_sim_board(self.board)
+        start = process_time()
+        move_id = self.horizon.best_move(board, self.estimated_time)
+        self.estimated_time -= process_time() - start
+        self.horizon.report()
+        return move_id
+
+    def endgame_move(self) -> int | None:
+        """
+        Proven winning (or drawing) move in the endgame, if the solver finds
+        one within its share of this move's time
+        """
+        if not self.solver:
+            return None
+        board = FastBoard.from_sim_board(self.board)
+        start = process_time()
+        result, move_id = self.solver.solve(
+            board, min(self.estimated_time * SOLVER_SHARE, MAX_SOLVE_TIME)
+        )
+        self.estimated_time -= process_time() - start
+        self.solver.report()
+        if result in (WIN, DRAW):
+            debug("endgame solved:", "win" if result == WIN else "draw")
+            return move_id
+        return None
+
+    def fallback_move(self) -> Action:
+        """
+        Move that needs no search: the best legal move by prior
+        """
+        moves = FastBoard.from_sim_board(self.board).legal_moves()
+        context = PriorContext(self.board.state, self.color)
+        return id_action(max(moves, key=context.prior))
 
     def random_move(self) -> Action:
         """
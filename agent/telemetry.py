@@ -0,0 +1,80 @@
+import json
+
+# Per-move search telemetry: one JSON Lines record per move, written next to
+# (not mixed into) the printed log. Every record has every field, None where
+# the engine that answered has no such number, so the files of a whole
+# tournament can be concatenated and aggregated (testing/telemetry_report.py).
+# Disabled telemetry only costs the `enabled` check: the numbers are not
+# even gathered.
+
+FIELDS = (
+    "agent",  # agent or configuration name
+    "game",  # game id given by the caller
+    "color",
+    "turn",
+    "engine",  # portfolio engine that answered
+    "legal_moves",
+    "simulations",
+    "reused_visits",  # root visits carried over from earlier searches
+    "nodes_created",
+    "tree_size",
+    "max_depth",
+    "rollouts_per_sec",
+    "table_hit_rate",  # transposition table of the alpha-beta engines
+    "cache_hit_rate",  # board cache of the lean tree
+    "memory_peak",  # share of the space limit at the move's peak
+    "prunes",  # memory governor activity during the search
+    "nodes_pruned",
+    "frozen",
+    "budget",  # CPU seconds planned for the move
+    "used",  # CPU seconds the move took
+    "stopped_early",  # search stopped once the root move was settled
+    "time_saved",  # CPU seconds of the budget left unused by stopping early
+    "time_banked",  # saved CPU seconds kept back for critical moves
+    "move",
+    "visit_share",  # share of the root visits spent on the chosen move
+)
+
+
+# ad hoc progress output (search sizes, engine and clock reports), printed
+# only while debugging: games log through Telemetry records instead
+DEBUG = False
+
+
+def debug(*args):
+    if DEBUG:
+        print(*args)
+
+
+class Telemetry:
+    """
+    JSON Lines writer, a no-op without a path
+    """
+
+    def __init__(
+        self, path: str | None = None, label: str | None = None, game: str | None = None
+    ):
+        self.path = path
+        self.enabled = path is not None
+        self.label = label
+        self.game = game
+        self.records = 0
+        self._file = None
+
+    def record(self, **fields):
+        if not self.enabled:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a")  # type: ignore
+        fields.setdefault("game", self.game)
+        if self.label is not None:
+            fields["agent"] = self.label
+        self._file.write(json.dumps({name: fields.get(name) for name in FIELDS}))
+        self._file.write("\n")
+        self._file.flush()
+        self.records += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
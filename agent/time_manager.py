@@ -0,0 +1,213 @@
+from statistics import pvariance
+from time import process_time
+
+from .telemetry import debug
+from referee.game.constants import MAX_TURNS
+
+# Per-move time budgets in CPU seconds (time.process_time), which is what the
+# referee's CountdownTimer charges, instead of simulating whole games to guess
+# how many moves are left.
+
+SAFETY_TIME = 0.5  # seconds never planned for, searches stop on a hard deadline
+PANIC_TIME = 0.2  # below this, answer with the fallback move straight away
+MIN_MOVE_TIME = 0.1  # per-move floor kept for every move up to the turn limit
+EXPECTED_GAME_PLIES = 80  # typical game length until games have been seen
+GAME_GROWTH = 1.25  # a game at ply n is expected to last to about n * this
+MAX_SHARE = 0.2  # never plan more than this share of the spare time
+CRITICAL_MOVES = 30  # fewer legal moves than this is a critical position
+CRITICAL_FACTOR = 1.5
+VARIANCE_FACTOR = 4.0  # extra time per unit of root value standard deviation
+MAX_VARIANCE_BONUS = 0.5
+BANK_RELEASE = 0.5  # share of the banked time spent on a critical move
+OVERHEAD_DECAY = 0.8  # weight of the old estimate of per-move overhead
+
+# early termination: stop once the root move can no longer change
+SETTLE_INTERVAL = 16  # simulations between checks
+SETTLE_MIN_VISITS = 20  # visits before a confidence bound is trusted
+SETTLE_Z = 2.0  # width of the confidence bounds, in standard deviations
+DECIDED_VALUE = 0.8  # a move this surely winning is good enough
+
+
+def confidence_bounds(visits: int, value: float) -> tuple[float, float]:
+    """
+    Wilson score interval of a mean result in [0, 1]
+    """
+    if visits <= 0:
+        return 0.0, 1.0
+    z2 = SETTLE_Z * SETTLE_Z
+    centre = (value + z2 / (2 * visits)) / (1 + z2 / visits)
+    spread = (
+        SETTLE_Z
+        * (value * (1 - value) / visits + z2 / (4 * visits * visits)) ** 0.5
+        / (1 + z2 / visits)
+    )
+    return centre - spread, centre + spread
+
+
+def root_settled(stats: list[tuple[int, float]], remaining: int) -> bool:
+    """
+    Whether the root decision is settled, given (visits, value) of every
+    root child and the simulations still left in the budget:
+    - the most visited child leads by more visits than are left (and has
+      the best value), or
+    - its confidence interval lies above every other child's, or
+    - it is winning so surely that finding a better move does not matter
+    """
+    if len(stats) < 2:
+        return False
+    ranked = sorted(stats, reverse=True)
+    leader_visits, leader_value = ranked[0]
+    others = ranked[1:]
+    if leader_value >= max(value for _, value in others) and (
+        leader_visits - others[0][0] > remaining
+    ):
+        return True
+    if leader_visits < SETTLE_MIN_VISITS:
+        return False
+    lower = confidence_bounds(leader_visits, leader_value)[0]
+    if lower >= DECIDED_VALUE:
+        return True
+    return all(
+        confidence_bounds(visits, value)[1] < lower for visits, value in others
+    )
+
+
+class TimeManager:
+    """
+    Splits the remaining CPU time over the moves we still expect to play,
+    keeping a floor for every move we could have to play
+    """
+
+    # lengths (plies) of the games seen by this process, shared by agents
+    game_lengths: list[int] = []
+
+    def __init__(self, safety: float = SAFETY_TIME):
+        self.safety = safety
+        self.last_turn = 0  # last turn seen, to notice when a game ends
+        # CPU time charged per move beyond its budget (board updates, move
+        # generation, updates on the opponent's move), a running mean
+        self.overhead: float = 0
+        self.last_remaining: float | None = None
+        self.budget: float = 0
+        self.start_time: float = 0
+        self.expected_moves: int = 0
+
+        # time saved by stopping early, kept back for critical moves
+        self.bank: float = 0
+        self.moves = 0
+        self.early_stops = 0
+        self.time_saved: float = 0
+        # the last finished move, for telemetry
+        self.stopped_early = False
+        self.last_saved: float = 0
+
+    def observe(self, turn_count: int):
+        """
+        Note the current turn, recording the previous game's length when a
+        new game has started
+        """
+        if turn_count < self.last_turn:
+            TimeManager.game_lengths.append(self.last_turn)
+        self.last_turn = turn_count
+
+    def remaining_moves(self, turn_count: int) -> int:
+        """
+        Our moves left (half of the plies are ours): up to the turn limit at
+        most, fewer if games seen so far (or EXPECTED_GAME_PLIES) suggest an
+        earlier end, pushed back the longer this game already lasts
+        """
+        to_limit = max(1, (MAX_TURNS - turn_count + 1) // 2)
+        lengths = TimeManager.game_lengths
+        typical = sum(lengths) / len(lengths) if lengths else EXPECTED_GAME_PLIES
+        end = min(MAX_TURNS, max(typical, turn_count * GAME_GROWTH))
+        expected = int(end - turn_count + 1) // 2
+        return max(1, min(to_limit, expected))
+
+    def criticality(self, num_moves: int, root_values: list[float]) -> float:
+        """
+        Factor to think longer on: few legal moves (mistakes are final) and
+        root moves whose values still disagree a lot
+        """
+        factor = 1.0
+        if num_moves < CRITICAL_MOVES:
+            factor *= CRITICAL_FACTOR
+        if len(root_values) > 1:
+            spread = pvariance(root_values) ** 0.5
+            factor *= 1 + min(MAX_VARIANCE_BONUS, VARIANCE_FACTOR * spread)
+        return factor
+
+    def allocate(
+        self,
+        time_remaining: float,
+        turn_count: int,
+        num_moves: int,
+        root_values: list[float] | None = None,
+    ) -> float:
+        """
+        Work out the CPU time budget for this move and start its clock:
+        a floor for this and every later move up to the turn limit, plus a
+        share of the spare time over the moves we expect to play
+        """
+        self.start_time = process_time()
+        self.observe(turn_count)
+        if self.last_remaining is not None:
+            spent = self.last_remaining - time_remaining
+            self.overhead = OVERHEAD_DECAY * self.overhead + (
+                1 - OVERHEAD_DECAY
+            ) * max(0.0, spent - self.budget)
+        self.last_remaining = time_remaining
+        self.expected_moves = self.remaining_moves(turn_count)
+        to_limit = max(1, (MAX_TURNS - turn_count + 1) // 2)
+        usable = max(0.0, time_remaining - self.safety - self.overhead * to_limit)
+        floor = min(MIN_MOVE_TIME, usable / to_limit)
+        spare = usable - floor * to_limit
+        self.bank = min(self.bank, spare)
+        budget = (spare - self.bank) / self.expected_moves
+        factor = self.criticality(num_moves, root_values or [])
+        budget *= factor
+        if factor > 1:
+            release = self.bank * BANK_RELEASE
+            self.bank -= release
+            budget += release
+        self.budget = floor + min(budget, spare * MAX_SHARE)
+        return self.budget
+
+    def finish(self, stopped_early: bool):
+        """
+        End the move's search, banking the unused budget if it stopped early
+        """
+        self.moves += 1
+        self.stopped_early = stopped_early
+        self.last_saved = 0
+        if not stopped_early:
+            return
+        saved = max(0.0, self.budget - self.elapsed())
+        self.last_saved = saved
+        self.early_stops += 1
+        self.time_saved += saved
+        self.bank += saved
+
+    def elapsed(self) -> float:
+        return process_time() - self.start_time
+
+    def panic(self, time_remaining: float | None) -> bool:
+        """
+        Too little time left to search at all
+        """
+        return time_remaining is not None and time_remaining < PANIC_TIME
+
+    def stats(self) -> dict:
+        """
+        Telemetry fields of the last finished move
+        """
+        return {
+            "stopped_early": self.stopped_early,
+            "time_saved": self.last_saved,
+            "time_banked": self.bank,
+        }
+
+    def report(self):
+        debug(
+            f"early stops: {self.early_stops}/{self.moves} moves, "
+            f"saved {self.time_saved:.2f}s, banked {self.bank:.2f}s"
+        )
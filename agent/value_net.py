@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+
+from .batch_eval import FILLS, MOBILITY, NUM_FEATURES
+from referee.game.constants import BOARD_N
+
+# Learned evaluation: a tiny MLP (or, with no hidden layer, a linear model)
+# over batch_eval.feature_tensor, giving the probability that the player to
+# move wins. Weights are trained by testing/train_value.py and stored in a
+# compressed .npz next to this file. Inference is plain NumPy.
+# No weights are shipped: trained on 3000 self-play games the net only
+# learned a constant (test loss 0.693, 50% accuracy), as these static
+# features cannot see who will run out of moves first. The heuristic scores
+# 0.739 and 51%, so the agent keeps using it.
+
+MOBILITY_SCALE = 100  # typical number of legal moves
+VALUE_WEIGHTS = os.path.join(os.path.dirname(__file__), "value_weights.npz")
+
+
+class ValueNet:
+    """
+    Value function: features (N, NUM_FEATURES) -> mover's win probability (N,)
+    """
+
+    def __init__(self, weights: dict[str, np.ndarray]):
+        self.weights = weights
+        self.scale = weights["scale"]  # per-feature input scaling
+        self.w1 = weights.get("w1")  # (features, hidden), absent if linear
+        self.b1 = weights.get("b1")
+        self.w2 = weights["w2"]  # (hidden or features,)
+        self.b2 = weights["b2"]  # scalar
+
+    @classmethod
+    def random(cls, hidden: int, seed: int | None = None) -> "ValueNet":
+        """
+        Untrained network, input scaling puts line fills on [0, 1] and
+        move counts around it
+        """
+        rng = np.random.default_rng(seed)
+        scale = np.ones(NUM_FEATURES, dtype=np.float32)
+        scale[FILLS:MOBILITY] = 1 / BOARD_N
+        scale[MOBILITY:] = 1 / MOBILITY_SCALE
+        weights = {"scale": scale, "b2": np.zeros((), dtype=np.float32)}
+        inputs = NUM_FEATURES
+        if hidden:
+            weights["w1"] = (
+                rng.standard_normal((inputs, hidden)) * (2 / inputs) ** 0.5
+            ).astype(np.float32)
+            weights["b1"] = np.zeros(hidden, dtype=np.float32)
+            inputs = hidden
+        weights["w2"] = np.zeros(inputs, dtype=np.float32)
+        return cls(weights)
+
+    @classmethod
+    def load(cls, path: str = VALUE_WEIGHTS) -> "ValueNet | None":
+        """
+        Trained network, None if there are no weights (yet)
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def save(self, path: str = VALUE_WEIGHTS):
+        np.savez_compressed(path, **self.weights)
+
+    def hidden(self, features: np.ndarray) -> np.ndarray:
+        """
+        Input of the output layer: hidden activations, or the scaled features
+        """
+        x = features * self.scale
+        if self.w1 is None:
+            return x
+        return np.maximum(x @ self.w1 + self.b1, 0)
+
+    def __call__(self, features: np.ndarray) -> np.ndarray:
+        logits = self.hidden(features) @ self.w2 + self.b2
+        return 1 / (1 + np.exp(-logits))
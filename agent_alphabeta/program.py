@@ -0,0 +1,62 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from agent.helpers.feature_board import FeatureBoard
+from agent.helpers.placements import action_id, id_action
+from agent.time_manager import TimeManager
+from referee.game import PlayerColor, Action
+
+from .search import AlphaBeta
+
+# Iterative deepening alpha-beta agent, to compare against the MCTS agent
+# under the same referee limits. It shares the bitboard, the move generator,
+# the evaluation and the time manager with agent/.
+
+UNLIM_TIME = 5.0  # CPU seconds per move when there is no referee clock
+
+
+class Agent:
+
+    # attributes
+    board: FeatureBoard  # state of game
+    search: AlphaBeta  # search with its tables
+    clock: TimeManager  # CPU time budget per move
+    color: PlayerColor  # agent colour
+    name: str  # agent name
+    opponent: PlayerColor  # agent opponent
+
+    def __init__(self, color: PlayerColor, **referee: dict):
+        self.init(color)
+
+    def init(self, color: PlayerColor):
+        self.board = FeatureBoard()
+        self.search = AlphaBeta()
+        self.clock = TimeManager()
+        self.color = color
+        self.name = "Agent_AlphaBeta " + self.color.name
+        self.opponent = self.color.opponent
+
+        print(f"{self.name} *initiated*: {self.color}")
+
+    def action(self, **referee: dict) -> Action:
+        """
+        Search until the move's time budget runs out
+        """
+        moves = self.board.legal_moves()
+        time_remaining: float | None = referee.get("time_remaining")  # type: ignore
+        if time_remaining is None:
+            budget = UNLIM_TIME
+        else:
+            if self.clock.panic(time_remaining):
+                return id_action(moves[0])
+            budget = self.clock.allocate(
+                time_remaining, self.board.turn_count, len(moves)
+            )
+        move_id = self.search.best_move(self.board, budget)
+        self.search.report()
+        if move_id is None:
+            move_id = moves[0]
+        return id_action(move_id)
+
+    def update(self, color: PlayerColor, action: Action, **referee: dict):
+        self.board.apply(action_id(action))
@@ -0,0 +1,201 @@
+from agent.deadline import Deadline, SearchTimeout
+from agent.evaluation import feature_judge
+from agent.helpers.feature_board import FeatureBoard
+from agent.helpers.placements import NUM_PLACEMENTS
+from agent.helpers.transposition import (
+    EXACT,
+    LOWER,
+    UPPER,
+    TranspositionTable,
+    zobrist_key,
+    zobrist_update,
+)
+from agent.telemetry import debug
+from referee.game.constants import MAX_TURNS
+from referee.game.player import PlayerColor
+
+# Iterative deepening alpha-beta (negamax, fail-soft) on the FeatureBoard,
+# judged by the incremental feature evaluation. Each iteration starts with
+# an aspiration window around the previous score and searches again with
+# the full window if the score falls outside. Moves are ordered by the
+# transposition table move, then two killer moves per ply, then the history
+# heuristic (cutoffs found so far, weighted by depth squared).
+
+MAX_DEPTH = 32
+WIN_SCORE = 10_000.0  # the side to move cannot place a piece
+ASPIRATION = 4.0  # half width of the window around the previous score
+KILLERS = 2  # killer moves kept per ply
+
+
+class AlphaBeta:
+    """
+    Anytime alpha-beta search, its tables kept from move to move
+    """
+
+    def __init__(self):
+        self.table = TranspositionTable()
+        self.killers: list[list[int]] = [[-1] * KILLERS for _ in range(MAX_DEPTH)]
+        # colour -> placement id -> cutoff score
+        self.history: list[list[int]] = [[0] * NUM_PLACEMENTS for _ in range(2)]
+        self.nodes = 0
+        self.depth = 0  # last completed depth
+        self.score = 0.0  # score of the last completed depth
+        self.researches = 0  # aspiration windows missed
+
+    def best_move(self, board: FeatureBoard, budget: float) -> int | None:
+        """
+        Search deeper until time runs out, return the best move of the
+        deepest completed iteration
+        """
+        board = board.copy()
+        key = zobrist_key(
+            board.tokens[0],
+            board.tokens[1],
+            board.turn_color == PlayerColor.BLUE,
+            board.turn_count,
+        )
+        self.nodes = 0
+        self.depth = 0
+        self.researches = 0
+        self.killers = [[-1] * KILLERS for _ in range(MAX_DEPTH)]
+        # old history still orders well, but should not outweigh new cutoffs
+        for scores in self.history:
+            for i, score in enumerate(scores):
+                scores[i] = score // 2
+
+        moves = board.legal_moves()
+        if not moves:
+            return None
+        best = moves[0]
+        # scores swing between odd and even depths, windows are centred on
+        # the score of two plies less
+        scores = [feature_judge(board)] * 2
+        max_depth = min(MAX_DEPTH, MAX_TURNS - board.turn_count)
+        try:
+            with Deadline(budget) as deadline:
+                for depth in range(1, max_depth + 1):
+                    score = self.aspiration_search(
+                        board, key, depth, scores[-2], deadline
+                    )
+                    scores.append(score)
+                    entry = self.table.probe(key)
+                    if entry is not None and entry[4] >= 0:
+                        best = entry[4]
+                    self.depth = depth
+                    self.score = score
+                    if abs(score) >= WIN_SCORE:
+                        break
+        except SearchTimeout:
+            pass
+        return best
+
+    def aspiration_search(
+        self,
+        board: FeatureBoard,
+        key: int,
+        depth: int,
+        guess: float,
+        deadline: Deadline,
+    ) -> float:
+        """
+        Search with a narrow window around the guess, widening on a miss
+        """
+        if depth > 1:
+            alpha, beta = guess - ASPIRATION, guess + ASPIRATION
+            score = self.negamax(board, key, depth, 0, alpha, beta, deadline)
+            if alpha < score < beta:
+                return score
+            self.researches += 1
+        return self.negamax(board, key, depth, 0, -WIN_SCORE, WIN_SCORE, deadline)
+
+    def negamax(
+        self,
+        board: FeatureBoard,
+        key: int,
+        depth: int,
+        ply: int,
+        alpha: float,
+        beta: float,
+        deadline: Deadline,
+    ) -> float:
+        """
+        Score of the position for the player to move, exact inside
+        (alpha, beta) and a bound outside it
+        """
+        self.nodes += 1
+        deadline.check()
+        if board.turn_count >= MAX_TURNS:
+            return self.turn_limit_score(board)
+
+        entry = self.table.probe(key)
+        table_move = -1
+        if entry is not None:
+            _, stored_depth, value, bound, table_move = entry
+            if stored_depth >= depth and (
+                bound == EXACT
+                or bound == LOWER and value >= beta
+                or bound == UPPER and value <= alpha
+            ):
+                return value
+        if depth == 0:
+            if board.turn_count >= 2 and not board.room(board.turn_color):
+                # no frontier cell a piece fits into
+                return -WIN_SCORE
+            return feature_judge(board)
+
+        moves = board.legal_moves()
+        if not moves:
+            return -WIN_SCORE
+        color = board.turn_color.value
+        killers = self.killers[ply]
+        history = self.history[color]
+        moves.sort(
+            key=lambda m: (m == table_move, m in killers, history[m]), reverse=True
+        )
+
+        original_alpha = alpha
+        best = -WIN_SCORE
+        best_move = moves[0]
+        for move in moves:
+            before = (board.tokens[0], board.tokens[1])
+            board.apply(move)
+            child = zobrist_update(key, before, board.tokens, board.turn_count - 1)
+            value = -self.negamax(
+                board, child, depth - 1, ply + 1, -beta, -alpha, deadline
+            )
+            board.undo()
+            if value > best:
+                best = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                if move != table_move and move not in killers:
+                    killers.insert(0, move)
+                    killers.pop()
+                history[move] += depth * depth
+                break
+
+        bound = EXACT
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        self.table.store(key, depth, best, bound, best_move)
+        return best
+
+    def turn_limit_score(self, board: FeatureBoard) -> float:
+        """
+        Final result at the turn limit for the player to move: the token
+        count decides, whoever can still move
+        """
+        color = board.turn_color
+        lead = board.token_count(color) - board.token_count(color.opponent)
+        return WIN_SCORE if lead > 0 else -WIN_SCORE if lead < 0 else 0.0
+
+    def report(self):
+        debug(
+            f"alpha-beta: depth {self.depth}, score {self.score:.1f}, "
+            f"{self.nodes} nodes, {self.researches} re-searches, "
+            f"table hits {self.table.hit_rate():.0%}"
+        )
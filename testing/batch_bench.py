@@ -0,0 +1,73 @@
+import random
+import sys
+from time import process_time
+
+from agent.batch_rollout import rollout_batch
+from agent.evaluation import predicted_winner
+from agent.helpers.fast_board import FastBoard
+from agent.helpers.movements import generate_random_move
+from agent.helpers.sim_board import SimBoard
+from agent.playouts import playout, random_policy
+
+# Playouts per CPU second of the rollout engines, from the same positions.
+#
+# usage: python -m testing.batch_bench [positions] [steps]
+# e.g.   python -m testing.batch_bench 1024 8
+
+
+def random_positions(count: int, seed: int = 0) -> list[SimBoard]:
+    """
+    Positions from random games, past the first turns and not finished
+    """
+    random.seed(seed)
+    positions = []
+    while len(positions) < count:
+        board = SimBoard()
+        for _ in range(random.randrange(4, 60)):
+            if board.game_over:
+                break
+            first_turns = board.turn_count < 2
+            board.apply_action(
+                generate_random_move(board.state, board.turn_color, first_turns)
+            )
+        if not board.game_over:
+            positions.append(board)
+    return positions
+
+
+def sim_board_loop(positions: list[SimBoard], steps: int):
+    for start in positions:
+        board = start.copy()
+        for _ in range(steps):
+            if board.game_over:
+                break
+            board.apply_action(generate_random_move(board.state, board.turn_color))
+        predicted_winner(FastBoard.from_sim_board(board))
+
+
+def fast_board_loop(positions: list[FastBoard], steps: int):
+    for start in positions:
+        board = start.copy()
+        playout(board, random_policy, steps)
+        predicted_winner(board)
+
+
+def bench(name: str, run, count: int):
+    start = process_time()
+    run()
+    elapsed = process_time() - start
+    print(f"{name:>14}: {count / elapsed:8.0f} playouts/s ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    sims = random_positions(count)
+    fasts = [FastBoard.from_sim_board(board) for board in sims]
+
+    # the SimBoard loop is slow, time it on a sample
+    sample = sims[: max(1, count // 8)]
+    bench("SimBoard", lambda: sim_board_loop(sample, steps), len(sample))
+    bench("FastBoard", lambda: fast_board_loop(fasts, steps), count)
+    bench("batch random", lambda: rollout_batch(fasts, steps), count)
+    bench("batch heavy", lambda: rollout_batch(fasts, steps, heavy=True), count)
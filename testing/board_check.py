@@ -0,0 +1,239 @@
+import random
+import sys
+
+from agent.helpers.fast_board import FastBoard
+from agent.helpers.feature_board import FeatureBoard
+from agent.helpers.placements import (
+    NUM_PLACEMENTS,
+    PLACEMENT_MASKS,
+    PLACEMENTS,
+    action_id,
+    coords_mask,
+    state_masks,
+)
+from referee.game.board import Board
+from referee.game.constants import BOARD_N, MAX_TURNS
+from referee.game.coord import Coord
+from referee.game.exceptions import IllegalActionException
+from referee.game.player import PlayerColor
+
+# Randomized equivalence check of the agent's boards against the referee's
+# Board: the same random games are played on all of them, comparing tokens
+# (so line clears), legal moves, game_over and winner_color after every move,
+# and tokens again while undoing the whole game. Every other game picks only
+# moves that leave both players a move, so most of those reach the turn limit.
+# BatchBoards is checked too when NumPy is installed.
+#
+# usage: python -m testing.board_check [games] [seed]
+# e.g.   python -m testing.board_check 6 1
+
+MAX_REPORTED = 20  # mismatches printed, the rest are only counted
+
+
+class Checker:
+    """
+    Collects mismatches between the boards, printing the first few
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.where = ""
+
+    def expect(self, what: str, ours, reference):
+        if ours == reference:
+            return
+        self.failures += 1
+        if self.failures <= MAX_REPORTED:
+            print(f"MISMATCH {self.where}, {what}: {ours} != {reference}")
+
+
+def reference_masks(board: Board) -> list[int]:
+    """
+    Token masks of the referee's board, indexed by colour
+    """
+    state = {
+        Coord(r, c): board[Coord(r, c)] for r in range(BOARD_N) for c in range(BOARD_N)
+    }
+    red, blue = state_masks(state, PlayerColor.RED)
+    return [red, blue]
+
+
+def reference_legal(board: Board) -> set[int]:
+    """
+    Ids of the placements the referee accepts, tried one by one (only
+    those with all four cells empty, any other is illegal anyway)
+    """
+    red, blue = reference_masks(board)
+    legal = set()
+    for move_id in range(NUM_PLACEMENTS):
+        if PLACEMENT_MASKS[move_id] & (red | blue):
+            continue
+        try:
+            board.apply_action(PLACEMENTS[move_id])
+        except IllegalActionException:
+            continue
+        board.undo_action()
+        legal.add(move_id)
+    return legal
+
+
+def check_placements(checker: Checker):
+    """
+    The placement table: ids round trip, masks match the coordinates and
+    the referee accepts every placement (and only these) on an empty board
+    """
+    checker.where = "placements"
+    for move_id, action in enumerate(PLACEMENTS):
+        checker.expect(f"id of {action}", action_id(action), move_id)
+        checker.expect(
+            f"mask of {action}", PLACEMENT_MASKS[move_id], coords_mask(action.coords)
+        )
+    checker.expect("distinct masks", len(set(PLACEMENT_MASKS)), NUM_PLACEMENTS)
+    checker.expect("empty board", reference_legal(Board()), set(range(NUM_PLACEMENTS)))
+
+
+def survival_move(board: FastBoard, moves: list[int], rng: random.Random) -> int:
+    """
+    A random move after which both players can still move, if there is one
+    """
+    for move_id in rng.sample(moves, len(moves)):
+        board.apply(move_id)
+        alive = board.has_move(PlayerColor.RED) and board.has_move(PlayerColor.BLUE)
+        board.undo()
+        if alive:
+            return move_id
+    return rng.choice(moves)
+
+
+def check_game(checker: Checker, game: int, survival: bool, rng: random.Random) -> int:
+    """
+    Play one random game on every board, return its number of turns
+    """
+    reference = Board()
+    fast = FastBoard()
+    feature = FeatureBoard()
+    batch = batch_boards(fast)
+    played = []
+
+    while True:
+        checker.where = f"game {game}, turn {reference.turn_count}"
+        compare_position(checker, reference, fast, feature, batch)
+        if reference.game_over:
+            break
+        moves = fast.legal_moves()
+        checker.expect("legal moves", set(moves), reference_legal(reference))
+        if not moves:
+            break
+        if survival:
+            move_id = survival_move(fast, moves, rng)
+        else:
+            move_id = rng.choice(moves)
+        reference.apply_action(PLACEMENTS[move_id])
+        fast.apply(move_id)
+        feature.apply(move_id)
+        if batch is not None:
+            batch_apply(batch, move_id)
+        played.append(move_id)
+
+    turns = reference.turn_count
+    for _ in played:
+        reference.undo_action()
+        fast.undo()
+        feature.undo()
+        checker.where = f"game {game}, undo to turn {reference.turn_count}"
+        masks = reference_masks(reference)
+        checker.expect("tokens", fast.tokens, masks)
+        checker.expect("feature tokens", feature.tokens, masks)
+        compare_features(checker, feature)
+    return turns
+
+
+def compare_position(
+    checker: Checker, reference: Board, fast: FastBoard, feature: FeatureBoard, batch
+):
+    """
+    Compare the position, the end of game and the winner on every board
+    """
+    masks = reference_masks(reference)
+    checker.expect("tokens", fast.tokens, masks)
+    checker.expect("feature tokens", feature.tokens, masks)
+    checker.expect("turn colour", fast.turn_color, reference.turn_color)
+    checker.expect("turn count", fast.turn_count, reference.turn_count)
+    game_over = reference.game_over
+    checker.expect("game over", fast.game_over, game_over)
+    checker.expect("feature game over", feature.game_over, game_over)
+    checker.expect("winner", fast.winner_color, reference.winner_color)
+    checker.expect("feature winner", feature.winner_color, reference.winner_color)
+    compare_features(checker, feature)
+    if batch is not None:
+        compare_batch(checker, batch, fast, game_over)
+
+
+def compare_features(checker: Checker, feature: FeatureBoard):
+    """
+    Incrementally kept features against ones computed from scratch
+    """
+    fresh = FeatureBoard(*feature.tokens, feature.turn_color, feature.turn_count)
+    checker.expect("frontiers", feature.frontiers, fresh.frontiers)
+    checker.expect("fills", feature.fills, fresh.fills)
+    checker.expect("dead cells", feature.dead, fresh.dead)
+
+
+def batch_boards(fast: FastBoard):
+    """
+    A one game BatchBoards following the game, None without NumPy
+    """
+    try:
+        from agent.batch_rollout import BatchBoards
+    except ImportError:
+        return None
+    return BatchBoards([fast])
+
+
+def batch_apply(batch, move_id: int):
+    import numpy as np
+
+    batch.apply(np.array([0]), np.array([move_id]))
+
+
+def compare_batch(checker: Checker, batch, fast: FastBoard, game_over: bool):
+    import numpy as np
+
+    from agent.batch_rollout import CELLS, NO_WINNER, _bits
+
+    game = np.array([0])
+    for color in PlayerColor:
+        tokens = np.flatnonzero(batch.planes[0, color.value, :CELLS]).tolist()
+        checker.expect(f"batch {color} tokens", tokens, _bits(fast.tokens[color]))
+    checker.expect("batch turn count", int(batch.turn_count[0]), fast.turn_count)
+    if game_over:
+        winner = int(batch.resolve(game)[0])
+        checker.expect(
+            "batch winner",
+            None if winner == NO_WINNER else PlayerColor(winner),
+            fast.winner_color,
+        )
+    if fast.turn_count >= MAX_TURNS:
+        # playouts stop at the limit without asking for moves
+        return
+    legal = batch.legal(game, batch.turn_color[game])[0][0]
+    checker.expect(
+        "batch legal moves", set(np.flatnonzero(legal).tolist()), set(fast.legal_moves())
+    )
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+    checker = Checker()
+    check_placements(checker)
+    at_limit = 0
+    for game in range(games):
+        survival = game % 2 == 1
+        turns = check_game(checker, game, survival, rng)
+        at_limit += turns >= MAX_TURNS
+        kind = "survival" if survival else "random"
+        print(f"game {game} ({kind}): {turns} turns")
+    print(f"{games} games, {at_limit} reached the turn limit, {checker.failures} mismatches")
+    sys.exit(1 if checker.failures else 0)
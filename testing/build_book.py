@@ -0,0 +1,85 @@
+import os
+import sys
+from multiprocessing import get_context
+
+from agent.book import BOOK_PATH, book_key, write_book
+from agent.helpers.fast_board import FastBoard
+from agent.helpers.placements import action_id
+from agent.helpers.symmetry import transform_move
+from agent.lean_mcts import LeanSearch
+from referee.game.player import PlayerColor
+
+# Build the opening book: search every position of the first plies deeply,
+# one worker process per position, and store the best reply of each.
+# From every position the most visited replies are followed to the next ply,
+# so the book covers the lines either side is likely to play. Positions are
+# deduplicated by their canonical hash (torus and D4 symmetries).
+#
+# usage: python -m testing.build_book [plies] [seconds] [width] [workers]
+# e.g.   python -m testing.build_book 4 10 6 4
+
+SEARCH_DEPTH = 8  # rollout steps of the book searches
+MAX_SIMS = 1_000_000  # the time limit ends each search first
+
+Position = tuple[int, int, int, int]  # red, blue, turn colour, turn count
+
+
+def search(job: tuple[Position, float, int]) -> tuple[int, int, list[int]]:
+    """
+    Search a position, return its book key, the canonical best reply and
+    the most visited replies (in the position's own frame)
+    """
+    (red, blue, color, turn_count), seconds, width = job
+    board = FastBoard(red, blue, PlayerColor(color), turn_count)
+    key, transform = book_key(board)
+    lean = LeanSearch(board, playout="heavy")
+    lean.estimated_time = seconds
+    action = lean.best_action(SEARCH_DEPTH, MAX_SIMS)
+    best = action_id(action)  # type: ignore
+    children = sorted(
+        lean.root.children.values(), key=lambda child: child.visits, reverse=True
+    )
+    return key, transform_move(best, transform), [c.move for c in children[:width]]
+
+
+def build(plies: int, seconds: float, width: int, workers: int) -> dict[int, int]:
+    """
+    Search the positions of the first plies level by level
+    """
+    entries: dict[int, int] = {}
+    level: list[Position] = [(0, 0, PlayerColor.RED.value, 0)]
+    with get_context("fork").Pool(workers) as pool:
+        for ply in range(plies):
+            print(f"ply {ply}: {len(level)} positions")
+            jobs = [(position, seconds, width) for position in level]
+            next_level: dict[int, Position] = {}
+            for position, (key, move_id, replies) in zip(
+                level, pool.map(search, jobs)
+            ):
+                entries[key] = move_id
+                red, blue, color, turn_count = position
+                for reply in replies:
+                    board = FastBoard(red, blue, PlayerColor(color), turn_count)
+                    board.apply(reply)
+                    if board.game_over:
+                        continue
+                    child_key, _ = book_key(board)
+                    if child_key not in entries:
+                        next_level[child_key] = (
+                            *board.tokens,
+                            board.turn_color.value,
+                            board.turn_count,
+                        )  # type: ignore
+            level = list(next_level.values())
+    return entries
+
+
+if __name__ == "__main__":
+    plies = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    width = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count() or 1
+
+    entries = build(plies, seconds, width, workers)
+    write_book(entries)
+    print(f"saved {len(entries)} positions to {BOOK_PATH}")
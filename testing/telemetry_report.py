@@ -0,0 +1,89 @@
+import json
+import sys
+from collections import defaultdict
+
+from agent.telemetry import FIELDS
+
+# Aggregate per-move telemetry records (agent/telemetry.py) across games:
+# one line per agent and engine with move counts and the mean of each
+# numeric field over the moves that have it.
+#
+# usage: python -m testing.telemetry_report <telemetry.jsonl> [...]
+# e.g.   python -m testing.telemetry_report moves.jsonl
+
+COLUMNS = (
+    "simulations",
+    "reused_visits",
+    "nodes_created",
+    "tree_size",
+    "max_depth",
+    "rollouts_per_sec",
+    "table_hit_rate",
+    "cache_hit_rate",
+    "memory_peak",
+    "prunes",
+    "nodes_pruned",
+    "budget",
+    "used",
+    "stopped_early",  # mean of a flag: share of moves stopped early
+    "time_saved",
+    "time_banked",
+    "visit_share",
+)
+
+
+def load(paths: list[str]) -> list[dict]:
+    records = []
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    records.append(json.loads(line))
+    return records
+
+
+def aggregate(records: list[dict]) -> dict[tuple[str, str], dict[str, float]]:
+    """
+    (agent, engine) -> moves, games, mean of each column and time overrun
+    """
+    groups: dict[tuple[str, str], list[dict]] = defaultdict(list)
+    for record in records:
+        groups[(record["agent"], record["engine"])].append(record)
+
+    summary = {}
+    for key, moves in sorted(groups.items()):
+        row: dict[str, float] = {
+            "moves": len(moves),
+            "games": len({move["game"] for move in moves}),
+        }
+        for column in COLUMNS:
+            values = [move[column] for move in moves if move.get(column) is not None]
+            row[column] = sum(values) / len(values) if values else float("nan")
+        # moves that took longer than planned
+        timed = [move for move in moves if move["budget"]]
+        row["over_budget"] = (
+            sum(move["used"] > move["budget"] for move in timed) / len(timed)
+            if timed
+            else float("nan")
+        )
+        summary[key] = row
+    return summary
+
+
+def print_summary(summary: dict[tuple[str, str], dict[str, float]]):
+    header = ("agent", "engine", "moves", "games", *COLUMNS, "over_budget")
+    print("\t".join(header))
+    for (agent, engine), row in summary.items():
+        cells = [agent, engine]
+        for name in header[2:]:
+            value = row[name]
+            cells.append(f"{value:.0f}" if value >= 100 else f"{value:.3g}")
+        print("\t".join(cells))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m testing.telemetry_report <telemetry.jsonl> [...]")
+        print("fields:", ", ".join(FIELDS))
+        sys.exit(1)
+    print_summary(aggregate(load(sys.argv[1:])))
@@ -0,0 +1,154 @@
+import contextlib
+import io
+import sys
+from time import process_time
+from typing import Callable
+
+from agent.mcts import SearchOptions
+from agent.program import NARROW_DEPTH, Agent
+from agent.telemetry import Telemetry
+from agent_alphabeta import Agent as AlphaBetaAgent
+from referee.game.board import Board
+from referee.game.player import PlayerColor
+
+# Play agent configurations against each other, each side getting the same
+# CPU time budget per game (measured like the referee's CountdownTimer).
+#
+# usage: python -m testing.tournament <config> <config> [games] [seconds] [telemetry]
+# e.g.   python -m testing.tournament uct rave 10 60 moves.jsonl
+# With a telemetry file, MCTS agents append a record per move to it, tagged
+# with their configuration and game (see testing/telemetry_report.py).
+
+
+def mcts_agent(endgame: bool = True, **options) -> Callable[[PlayerColor], Agent]:
+    """
+    Make a factory for MCTS agents using the given search options, with or
+    without the endgame solver
+    """
+
+    def make(color: PlayerColor) -> Agent:
+        agent = Agent(color)
+        agent.options = SearchOptions(**options)
+        if not endgame:
+            agent.solver = None
+        return agent
+
+    return make
+
+
+def batch_rollout_agent(batch_size: int, **options) -> Callable[[PlayerColor], Agent]:
+    """
+    Make a factory for MCTS agents valuing leaves by vectorised playouts,
+    batch_size leaves at a time
+    """
+    make_mcts = mcts_agent(**options)
+
+    def make(color: PlayerColor) -> Agent:
+        # imported here so that NumPy stays optional
+        from agent.batch_eval import BatchEvaluator, RolloutModel
+
+        agent = make_mcts(color)
+        agent.evaluator = BatchEvaluator(batch_size, model=RolloutModel(NARROW_DEPTH))
+        return agent
+
+    return make
+
+
+CONFIGS: dict[str, Callable[[PlayerColor], Agent]] = {
+    "uct": mcts_agent(),
+    "rave": mcts_agent(rave=True),
+    "widening": mcts_agent(widening=True),
+    "halving": mcts_agent(widening=True, halving=True),
+    "heavy": mcts_agent(widening=True, playout="heavy"),
+    "adaptive": mcts_agent(widening=True, adaptive_cutoff=True),
+    "features": mcts_agent(widening=True, evaluation="features"),
+    "puct": mcts_agent(puct=True),
+    "no-solver": mcts_agent(endgame=False, widening=True),
+    "alphabeta": AlphaBetaAgent,
+    "batch-rollout": batch_rollout_agent(16, widening=True),
+}
+
+
+def play_game(
+    make_red: Callable,
+    make_blue: Callable,
+    time_limit: float,
+    telemetry: dict[PlayerColor, Telemetry] | None = None,
+) -> PlayerColor | None:
+    """
+    Play one game, return the winner (None for a draw)
+    """
+    board = Board()
+    agents = {PlayerColor.RED: make_red(PlayerColor.RED)}
+    agents[PlayerColor.BLUE] = make_blue(PlayerColor.BLUE)
+    if telemetry:
+        for color, agent in agents.items():
+            if hasattr(agent, "telemetry"):
+                agent.telemetry = telemetry[color]
+    clocks = {PlayerColor.RED: 0.0, PlayerColor.BLUE: 0.0}
+
+    while not board.game_over:
+        color = board.turn_color
+        start = process_time()
+        action = agents[color].action(
+            time_remaining=time_limit - clocks[color],
+            space_remaining=None,
+            space_limit=None,
+        )
+        clocks[color] += process_time() - start
+        if clocks[color] > time_limit:
+            # out of time, same as the referee
+            return color.opponent
+
+        board.apply_action(action)
+        for agent in agents.values():
+            agent.update(color, action)
+    return board.winner_color
+
+
+def play_match(
+    a: str, b: str, games: int, time_limit: float, telemetry_path: str | None = None
+) -> dict[str, float]:
+    """
+    Play a match between two configurations, alternating colours
+    Return the score of each configuration (a draw is worth half a win)
+    """
+    scores = {a: 0.0, b: 0.0}
+    for game in range(games):
+        red, blue = (a, b) if game % 2 == 0 else (b, a)
+        telemetry = None
+        if telemetry_path:
+            game_id = f"{red}-{blue}-{game + 1}"
+            telemetry = {
+                PlayerColor.RED: Telemetry(telemetry_path, red, game_id),
+                PlayerColor.BLUE: Telemetry(telemetry_path, blue, game_id),
+            }
+        # agents print a lot, keep the match output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            winner = play_game(CONFIGS[red], CONFIGS[blue], time_limit, telemetry)
+        if telemetry:
+            for log in telemetry.values():
+                log.close()
+        if winner is None:
+            scores[red] += 0.5
+            scores[blue] += 0.5
+        else:
+            scores[red if winner == PlayerColor.RED else blue] += 1
+        print(f"game {game + 1}: {red} (RED) v {blue} (BLUE), winner {winner}")
+    return scores
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(
+            "Usage: python -m testing.tournament <config> <config> "
+            "[games] [seconds] [telemetry]"
+        )
+        print("configs:", ", ".join(CONFIGS))
+        sys.exit(1)
+    games = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    time_limit = float(sys.argv[4]) if len(sys.argv) > 4 else 60.0
+    telemetry_path = sys.argv[5] if len(sys.argv) > 5 else None
+    scores = play_match(sys.argv[1], sys.argv[2], games, time_limit, telemetry_path)
+    for name, score in scores.items():
+        print(f"{name}: {score}/{games} ({score / games:.0%})")
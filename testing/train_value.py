@@ -0,0 +1,153 @@
+import random
+import sys
+
+import numpy as np
+
+from agent.batch_eval import FILLS, MOBILITY, feature_tensor, heuristic_model
+from agent.helpers.fast_board import FastBoard
+from agent.playouts import heavy_policy
+from agent.value_net import VALUE_WEIGHTS, ValueNet
+from referee.game.constants import BOARD_N
+
+# Train the value network on self-play outcomes and save it for the agent.
+# Games are played with the heavy playout policy; a sample of their positions
+# is labelled 1 / 0.5 / 0 by whether the player to move went on to win.
+# The board is a torus, so every minibatch is shifted by a random translation.
+# The weights are only saved if the net beats heuristic_model on both the
+# log loss and the accuracy of the held out games: a constant prediction
+# can have the lower loss and is of no use to the agent.
+#
+# usage: python -m testing.train_value [games] [hidden] [epochs]
+# e.g.   python -m testing.train_value 3000 16 30
+
+SAMPLE_RATE = 0.3  # share of positions kept from each game
+LATE_PLIES = 10  # positions this close to the end are reported separately
+HOLDOUT = 0.1  # share of games kept for validation
+LEARNING_RATE = 0.003
+BATCH = 256
+L2 = 1e-3
+
+
+def self_play(
+    games: int, seed: int = 0
+) -> tuple[list[FastBoard], list[float], list[int]]:
+    """
+    Positions, their outcomes for the player to move and the number of
+    plies left in their game
+    """
+    random.seed(seed)
+    boards, labels, to_end = [], [], []
+    for _ in range(games):
+        board = FastBoard()
+        positions = []
+        while not board.game_over:
+            if board.turn_count >= 2 and random.random() < SAMPLE_RATE:
+                positions.append(board.copy())
+            board.apply(heavy_policy(board))
+        winner = board.winner_color
+        for position in positions:
+            boards.append(position)
+            to_end.append(board.turn_count - position.turn_count)
+            if winner is None:
+                labels.append(0.5)
+            else:
+                labels.append(float(winner == position.turn_color))
+    return boards, labels, to_end
+
+
+def shift(x: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """
+    Translate feature tensors on the torus
+    """
+    planes = x[:, :FILLS].reshape(len(x), -1, BOARD_N, BOARD_N)
+    planes = np.roll(planes, (rows, cols), axis=(2, 3))
+    row_fills = np.roll(x[:, FILLS : FILLS + BOARD_N], rows, axis=1)
+    col_fills = np.roll(x[:, FILLS + BOARD_N : MOBILITY], cols, axis=1)
+    return np.concatenate(
+        [planes.reshape(len(x), -1), row_fills, col_fills, x[:, MOBILITY:]], axis=1
+    )
+
+
+def log_loss(p: np.ndarray, y: np.ndarray) -> float:
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def accuracy(p: np.ndarray, y: np.ndarray) -> float:
+    decided = y != 0.5
+    return float(np.mean((p[decided] > 0.5) == (y[decided] > 0.5)))
+
+
+def train(
+    x: np.ndarray, y: np.ndarray, hidden: int, epochs: int, seed: int = 0
+) -> ValueNet:
+    """
+    Fit the network to the labels with Adam on the log loss
+    """
+    net = ValueNet.random(hidden, seed)
+    names = [name for name in ("w1", "b1", "w2", "b2") if name in net.weights]
+    moments = {name: [0.0, 0.0] for name in names}
+    rng = np.random.default_rng(seed)
+    step = 0
+    for epoch in range(epochs):
+        order = rng.permutation(len(x))
+        for start in range(0, len(x), BATCH):
+            batch = order[start : start + BATCH]
+            rows, cols = rng.integers(BOARD_N, size=2)
+            xb, yb = shift(x[batch], rows, cols) * net.scale, y[batch]
+            h = xb if net.w1 is None else np.maximum(xb @ net.w1 + net.b1, 0)
+            p = 1 / (1 + np.exp(-(h @ net.w2 + net.b2)))
+            g = (p - yb) / len(batch)
+            grads = {"w2": h.T @ g + L2 * net.w2, "b2": g.sum()}
+            if net.w1 is not None:
+                dh = np.outer(g, net.w2) * (h > 0)
+                grads["w1"] = xb.T @ dh + L2 * net.w1
+                grads["b1"] = dh.sum(axis=0)
+
+            step += 1
+            for name in names:
+                m, v = moments[name]
+                m = 0.9 * m + 0.1 * grads[name]
+                v = 0.999 * v + 0.001 * grads[name] ** 2
+                moments[name] = [m, v]
+                update = (m / (1 - 0.9**step)) / (
+                    (v / (1 - 0.999**step)) ** 0.5 + 1e-8
+                )
+                net.weights[name] = (net.weights[name] - LEARNING_RATE * update).astype(
+                    np.float32
+                )
+            net = ValueNet(net.weights)
+        print(f"epoch {epoch + 1}: loss {log_loss(net(x), y):.4f}")
+    return net
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    hidden = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    epochs = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+    split = int(games * (1 - HOLDOUT))
+    train_boards, train_labels, _ = self_play(split, seed=0)
+    test_boards, test_labels, to_end = self_play(games - split, seed=1)
+    late = np.array(to_end) <= LATE_PLIES
+    print(f"{len(train_boards)} training and {len(test_boards)} test positions")
+    x, y = feature_tensor(train_boards), np.array(train_labels, dtype=np.float32)
+    x_test = feature_tensor(test_boards)
+    y_test = np.array(test_labels, dtype=np.float32)
+
+    net = train(x, y, hidden, epochs)
+    scores = {}
+    for name, model in (("heuristic", heuristic_model), ("value net", net)):
+        p = model(x_test)
+        scores[name] = (log_loss(p, y_test), accuracy(p, y_test))
+        print(
+            f"{name:>10}: test loss {scores[name][0]:.4f}, "
+            f"accuracy {scores[name][1]:.1%}, "
+            f"last {LATE_PLIES} plies {accuracy(p[late], y_test[late]):.1%}"
+        )
+    net_loss, net_accuracy = scores["value net"]
+    if net_loss >= scores["heuristic"][0] or net_accuracy <= scores["heuristic"][1]:
+        print("not saved: the value net does not beat the heuristic")
+        sys.exit(1)
+    net.save(VALUE_WEIGHTS)
+    print("saved", VALUE_WEIGHTS)